@@ -0,0 +1,249 @@
+"""ISO14443A / LAYR smartcard emulator.
+
+Pure-Python card behind the MFRC522 reader models: it answers REQA/WUPA,
+ANTICOLL, SELECT (SAK with CRC_A) and HLTA, and runs the LAYR AUTH_INIT /
+AUTH / GET_ID exchange for a configurable CardProfile. With a CardTiming
+attached, every response carries a latency built from 106 kbit/s air time,
+the ISO14443-3 frame delay time and per-command card processing time, plus
+the byte interval at which the reader FIFO fills. Faults (bit errors,
+truncated frames, late or missing responses) are injected on demand.
+"""
+
+import random
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+# ISO14443A Commands
+PICC_REQA       = 0x26
+PICC_WUPA       = 0x52
+PICC_ANTICOLL   = 0x93
+PICC_SELECT     = 0x93
+PICC_HALT       = 0x50
+
+# LAYR Protocol (CLA INS)
+LAYR_CLA        = 0x80
+INS_AUTH_INIT   = 0x10
+INS_AUTH        = 0x11
+INS_GET_ID      = 0x12
+
+# Card states (ISO14443-3)
+ST_IDLE         = "IDLE"
+ST_READY        = "READY"
+ST_ACTIVE       = "ACTIVE"
+ST_HALT         = "HALT"
+
+_ciphers = {}
+
+def _cipher(key, data):
+    # ECB contexts are stateless between whole blocks, so they can be reused.
+    # A partial block would stay buffered and shift every later call.
+    if len(data) % 16:
+        raise ValueError(f"AES-ECB input must be a multiple of 16 bytes, got {len(data)}")
+    c = _ciphers.get(key)
+    if c is None:
+        cipher = Cipher(algorithms.AES(key), modes.ECB())
+        c = (cipher.encryptor(), cipher.decryptor())
+        if len(_ciphers) > 4096:
+            _ciphers.clear()
+        _ciphers[key] = c
+    return c
+
+def aes_encrypt(key, data):
+    data = bytes(data)
+    return _cipher(bytes(key), data)[0].update(data)
+
+def aes_decrypt(key, data):
+    data = bytes(data)
+    return _cipher(bytes(key), data)[1].update(data)
+
+def crc_a(data):
+    """ISO14443-3 CRC_A, returned LSB first as transmitted"""
+    crc = 0x6363
+    for b in data:
+        b ^= crc & 0xFF
+        b = (b ^ (b << 4)) & 0xFF
+        crc = ((crc >> 8) ^ (b << 8) ^ (b << 3) ^ (b >> 4)) & 0xFFFF
+    return [crc & 0xFF, crc >> 8]
+
+class CardProfile:
+    def __init__(self, name="default", uid=(0x01, 0x02, 0x03, 0x04), psk=bytes(16),
+                 card_id=bytes([0xAA] * 16), atqa=(0x04, 0x00), sak=0x08, rc=None):
+        self.name = name
+        self.uid = list(uid)            # 4-byte single-size UID
+        self.psk = bytes(psk)           # LAYR pre-shared key
+        self.card_id = bytes(card_id)   # 16-byte ID returned by GET_ID
+        self.atqa = list(atqa)
+        self.sak = sak
+        self.rc = rc                    # fixed card challenge, None = random per AUTH_INIT
+
+# Example profiles for multi-card benches
+PROFILES = {
+    "default": CardProfile(),
+    "alice":   CardProfile("alice", (0xA1, 0x1C, 0xE0, 0x01), bytes(range(16)), bytes([0xA1] * 16)),
+    "bob":     CardProfile("bob",   (0xB0, 0xB0, 0x00, 0x02), bytes(range(16)), bytes([0xB0] * 16)),
+    "carol":   CardProfile("carol", (0xCA, 0x50, 0x10, 0x03), bytes(range(16, 32)), bytes([0xCA] * 16)),
+    "cloned":  CardProfile("cloned", (0xA1, 0x1C, 0xE0, 0x01), bytes([0xFF] * 16), bytes([0xA1] * 16)),
+}
+
+class CardTiming:
+    """Response timing, all values in microseconds"""
+    BIT_RATE_KBPS = 105.9375            # fc / 128
+
+    def __init__(self, fdt_us=86.4, byte_us=None, processing_us=None, jitter=0.1):
+        self.fdt_us = fdt_us            # frame delay time, 1172/fc
+        # 8 data bits + parity per byte on air; also the reader FIFO fill rate
+        self.byte_us = byte_us if byte_us is not None else 9 * 1000 / self.BIT_RATE_KBPS
+        # Card-side processing per command (JavaCard AES/RNG for LAYR APDUs)
+        self.processing_us = {
+            "REQA": 0, "WUPA": 0, "ANTICOLL": 0, "SELECT": 0, "HALT": 0,
+            "AUTH_INIT": 2500, "AUTH": 3500, "GET_ID": 2000,
+        }
+        if processing_us:
+            self.processing_us.update(processing_us)
+        self.jitter = jitter            # relative std. deviation of processing time
+
+class CardResponse:
+    def __init__(self, data, command=None, latency_us=0.0, byte_us=0.0, fault=None):
+        self.data = data                # response bytes ([] = no response)
+        self.command = command          # classified command name
+        self.latency_us = latency_us    # end of reader TX -> first byte in FIFO
+        self.byte_us = byte_us          # interval between FIFO bytes
+        self.fault = fault              # injected fault kind, if any
+
+class CardEmulator:
+    FAULTS = ("bit_error", "truncate", "late", "mute")
+
+    def __init__(self, profile=None, timing=None, seed=0, strict=False):
+        self.profile = profile if profile is not None else CardProfile()
+        self.timing = timing            # None = instant responses
+        self.rng = random.Random(seed)
+        self.strict = strict            # enforce ISO state machine and CRC_A on SELECT/HLTA
+        self.faults = []                # pending [kind, command, remaining, params]
+        self.stats = {}                 # responses per command
+        self.power_cycle()
+
+    def power_cycle(self):
+        """Card (re-)enters the RF field"""
+        self.state = ST_IDLE
+        self.last_rc = None
+        self.session_key = None
+
+    # --- Fault injection ---
+    def inject(self, kind, command=None, count=1, **params):
+        """Apply a fault to the next `count` responses (to `command`, if given).
+
+        bit_error: bits=1   truncate: keep=0   late: extra_us=5000   mute
+        """
+        if kind not in self.FAULTS:
+            raise ValueError(f"Unknown fault '{kind}'")
+        self.faults.append([kind, command, count, params])
+
+    def _take_fault(self, command):
+        for f in self.faults:
+            if f[1] is None or f[1] == command:
+                f[2] -= 1
+                if f[2] <= 0:
+                    self.faults.remove(f)
+                return f[0], f[3]
+        return None, None
+
+    # --- Command handling ---
+    def classify(self, tx):
+        n = len(tx)
+        if n == 0:
+            return None
+        if n == 1:
+            return {PICC_REQA: "REQA", PICC_WUPA: "WUPA"}.get(tx[0])
+        if tx[0] == PICC_ANTICOLL and n == 2 and tx[1] == 0x20:
+            return "ANTICOLL"
+        if tx[0] == PICC_SELECT:
+            return "SELECT"
+        if tx[0] == PICC_HALT and n >= 2 and tx[1] == 0x00:
+            return "HALT"
+        if tx[0] == LAYR_CLA and n >= 2:
+            if tx[1] == INS_AUTH_INIT and n == 2: return "AUTH_INIT"
+            if tx[1] == INS_AUTH:                 return "AUTH"  # length checked in handle()
+            if tx[1] == INS_GET_ID and n == 2:    return "GET_ID"
+        return None
+
+    def handle(self, command, tx):
+        p = self.profile
+        if command == "REQA":
+            if self.state == ST_HALT or (self.strict and self.state != ST_IDLE):
+                return []
+            self.state = ST_READY
+            return list(p.atqa)
+        if command == "WUPA":
+            self.state = ST_READY
+            return list(p.atqa)
+        if command == "ANTICOLL":
+            if self.state == ST_HALT:
+                return []
+            bcc = 0
+            for b in p.uid: bcc ^= b
+            return p.uid + [bcc]
+        if command == "SELECT":
+            if self.state == ST_HALT:
+                return []
+            if self.strict and (len(tx) != 9 or crc_a(tx[:7]) != tx[7:9] or tx[2:6] != p.uid):
+                return []
+            self.state = ST_ACTIVE
+            return [p.sak] + crc_a([p.sak])
+        if command == "HALT":
+            if self.strict and crc_a(tx[:2]) != tx[2:4]:
+                return []
+            self.state = ST_HALT
+            self.session_key = None
+            return []                   # HLTA is never answered
+        if self.state == ST_HALT or (self.strict and self.state != ST_ACTIVE):
+            return []
+        if command == "AUTH_INIT":
+            rc = p.rc if p.rc is not None else bytes(self.rng.randrange(256) for _ in range(8))
+            self.last_rc = rc
+            return list(aes_encrypt(p.psk, rc + bytes(8)))
+        if command == "AUTH":
+            if len(tx) != 18:
+                return [0xFF]           # token is exactly one AES block
+            decrypted = aes_decrypt(p.psk, bytes(tx[2:]))
+            rt, rc_received = decrypted[:8], decrypted[8:]
+            if rc_received == self.last_rc:
+                self.session_key = aes_encrypt(p.psk, rc_received + rt)
+                return [0x00]
+            return [0xFF]
+        if command == "GET_ID":
+            if self.session_key is not None:
+                return list(aes_encrypt(self.session_key, p.card_id))
+            return [0xFF]
+        return []
+
+    def respond(self, tx):
+        command = self.classify(tx)
+        data = self.handle(command, tx)
+        self.stats[command] = self.stats.get(command, 0) + 1
+
+        fault, params = self._take_fault(command) if self.faults else (None, None)
+        extra_us = 0.0
+        if fault == "bit_error" and data:
+            for _ in range(params.get("bits", 1)):
+                i = self.rng.randrange(len(data))
+                data[i] ^= 1 << self.rng.randrange(8)
+        elif fault == "truncate":
+            data = data[:params.get("keep", 0)]
+        elif fault == "late":
+            extra_us = params.get("extra_us", 5000)
+        elif fault == "mute":
+            data = []
+
+        if self.timing is None:
+            return CardResponse(data, command, extra_us, 0.0, fault)
+
+        t = self.timing
+        processing = t.processing_us.get(command, 0)
+        if processing and t.jitter:
+            processing = max(0.0, self.rng.gauss(processing, processing * t.jitter))
+        # Reader TX on air, frame delay, card processing, first byte on air
+        latency = len(tx) * t.byte_us + t.fdt_us + processing + t.byte_us + extra_us
+        return CardResponse(data, command, latency, t.byte_us, fault)
+
+    def transceive(self, tx):
+        return self.respond(tx).data
@@ -0,0 +1,331 @@
+"""Simulation checkpoint/restore for the cocotb benches.
+
+A checkpoint holds every register in the RTL hierarchy plus the state of the
+Python bus models. Restoring deposits the registers back through VPI and
+reloads the model attributes, so many scenarios can be forked from one
+"card selected, key loaded" point instead of re-running reset and bring-up.
+
+Capture should happen at a quiescent point: on a falling clock edge with all
+SPI chip selects released. Restore may interrupt a transaction, since the bus
+models abort a byte as soon as chip select is released.
+"""
+
+import base64
+import copy
+import functools
+import json
+import os
+import pickle
+import re
+
+import cocotb
+from cocotb.handle import (ArrayObject, EnumObject, HierarchyArrayObject, HierarchyObject,
+                           IntegerObject, LogicArrayObject, LogicObject, PackedObject)
+from cocotb.triggers import FallingEdge, ReadOnly, Timer
+from cocotb.types import Logic, LogicArray
+from cocotb.utils import get_sim_time
+
+# Purely combinational IP, recomputed from the restored operand registers
+DEFAULT_EXCLUDE = (
+    "u_aes_core.u_aes_encrypt",
+    "u_aes_core.u_aes_decrypt",
+)
+
+# Sources scanned for continuously driven nets
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SOURCE_DIRS = ("rtl", "ip", "cocotb_sim")
+
+# cocotb 2.x handle classes that hold a value; nets and variables alike
+VALUE_TYPES = (LogicObject, LogicArrayObject, PackedObject, EnumObject, IntegerObject)
+
+_KEYWORDS = {"input", "output", "inout", "wire", "logic", "reg", "signed", "unsigned", "integer", "var"}
+
+def _names(decl):
+    """Identifiers declared in a comma separated list like 'wire [7:0] a, b = c'"""
+    names = []
+    for item in re.sub(r"\[[^\]]*\]", " ", decl).split(","):
+        words = [w for w in re.findall(r"[A-Za-z_]\w*", item.split("=")[0]) if w not in _KEYWORDS]
+        if words:
+            names.append(words[-1])
+    return names
+
+def _block(body, start):
+    """Text of the statement or begin/end block starting at start"""
+    m = re.compile(r"\s*begin\b").match(body, start)
+    if not m:
+        return body[start:body.index(";", start) + 1]
+    depth, pos = 0, start
+    for tok in re.compile(r"\b(begin|end)\b").finditer(body, start):
+        depth += 1 if tok.group(1) == "begin" else -1
+        pos = tok.end()
+        if depth == 0:
+            break
+    return body[start:pos]
+
+def _block_end(body, start):
+    """Index of the ')' closing the port connection list opened before start"""
+    depth = 1
+    for i in range(start, len(body)):
+        depth += {"(": 1, ")": -1}.get(body[i], 0)
+        if depth == 0:
+            return i
+    return len(body)
+
+_GENERATE_IF = re.compile(r"\bif\s*\(((?:[^()]|\([^()]*\))*)\)(?=\s*begin\b)")
+
+def _assigned(body):
+    """(nets, stored) assigned in body; nets assigned with <= anywhere count as stored"""
+    nets = set()
+    for m in re.finditer(r"\bassign\s+(\{[^}]*\}|\w+)", body):
+        nets.update(re.findall(r"[A-Za-z_]\w*", m.group(1)))
+    for m in re.finditer(r"\balways_comb\b|\balways\s*@\s*(\(\s*\*\s*\)|\*)", body):
+        block = _block(body, m.end())
+        nets.update(re.findall(r"([A-Za-z_]\w*)\s*(?:\[[^\]]*\]\s*)*(?<![<>=!])=(?!=)", block))
+    stored = set(re.findall(r"([A-Za-z_]\w*)\s*(?:\[[^\]]*\]\s*)*<=", body))
+    return nets, stored
+
+def _generate_branches(body):
+    """Split off 'if (cond) begin : label ... end else begin ... end' generate branches
+
+    Returns the body without the branches and a list of
+    (cond, then_text, else_text).
+    """
+    branches, kept, pos = [], [], 0
+    for region in re.finditer(r"\bgenerate\b(.*?)\bendgenerate\b", body, re.S):
+        start = region.start(1)
+        for m in _GENERATE_IF.finditer(body, start, region.end(1)):
+            if m.start() < start:
+                continue  # nested in a branch already taken
+            then_text = _block(body, m.end())
+            end = m.end() + len(then_text)
+            else_text = ""
+            e = re.compile(r"\s*else(?=\s*begin\b)").match(body, end)
+            if e:
+                else_text = _block(body, e.end())
+                end = e.end() + len(else_text)
+            branches.append((m.group(1).strip(), then_text, else_text))
+            kept.append(body[pos:m.start()])
+            pos = start = end
+    kept.append(body[pos:])
+    return "".join(kept), branches
+
+@functools.lru_cache(maxsize=None)
+def _scan():
+    """Module name -> (driven nets outside generate branches, branches)
+
+    Each branch is (cond, (then_nets, then_stored), (else_nets, else_stored)).
+    """
+    modules = {}
+    for d in SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(REPO_DIR, d)):
+            for fn in files:
+                if fn.endswith((".v", ".sv")):
+                    with open(os.path.join(root, fn)) as f:
+                        src = re.sub(r"//[^\n]*|/\*.*?\*/", "", f.read(), flags=re.S)
+                    for m in re.finditer(r"\bmodule\s+(\w+)(.*?)\bendmodule\b", src, re.S):
+                        modules[m.group(1)] = m.group(2)
+
+    outputs, driven, branches = {}, {}, {}
+    for name, body in modules.items():
+        ports, nets = set(), set()
+        for decl in re.finditer(r"\b(input|output|inout|wire)\b((?:(?!\b(?:input|output|inout)\b)[^;)])*)", body):
+            # ANSI port lists continue after commas until the next direction
+            kind = decl.group(1)
+            names = _names(decl.group(2))
+            if kind == "output":
+                ports.update(names)
+            else:
+                nets.update(names)
+        common, split = _generate_branches(body)
+        assigned, stored = _assigned(common)
+        outputs[name] = ports
+        driven[name] = (nets | assigned) - stored
+        branches[name] = [(cond, _assigned(then_text), _assigned(else_text))
+                          for cond, then_text, else_text in split]
+
+    for name, body in modules.items():
+        for inst in re.finditer(r"\b(\w+)\s*(?:#\s*\((?:[^()]|\([^()]*\))*\))?\s*\w+\s*\(", body):
+            child = inst.group(1)
+            if child not in modules:
+                continue
+            for conn in re.finditer(r"\.(\w+)\s*\(([^()]*)\)", body[inst.end():_block_end(body, inst.end())]):
+                if conn.group(1) in outputs[child]:
+                    driven[name].update(re.findall(r"[A-Za-z_]\w*", re.sub(r"\[[^\]]*\]", "", conn.group(2))))
+    return {name: (driven[name], branches[name]) for name in modules}
+
+def driven_nets():
+    """Module name -> names that are continuously driven, not stored
+
+    Covers input ports, wires, assign targets, always_comb/always @(*)
+    outputs and signals connected to an instance output port. cocotb 2.x
+    reports nets and variables with the same handle class, so they are told
+    apart from the source. Generate branches are not included, see
+    module_nets().
+    """
+    return {name: nets for name, (nets, _) in _scan().items()}
+
+def _elaborated(handle, cond):
+    """Value of a generate condition from the instance parameters, None if unknown"""
+    expr = re.sub(r"!(?!=)", " not ", cond.replace("&&", " and ").replace("||", " or "))
+    try:
+        params = {n: int(getattr(handle, n).value)
+                  for n in set(re.findall(r"[A-Za-z_]\w*", expr)) - {"and", "or", "not"}}
+        return bool(eval(expr, {"__builtins__": {}}, params))
+    except (AttributeError, ValueError, TypeError, SyntaxError, NameError):
+        return None
+
+def module_nets(handle, default=frozenset()):
+    """Driven nets of a module instance, taking its elaborated generate branches
+
+    Simulators such as Verilator do not expose generate scopes, so the branch
+    is picked by evaluating the condition on the instance parameters. A name
+    that is an assign net in one branch and a register in the other (e.g.
+    aes_core operand isolation) is classified by the branch that exists.
+    """
+    scan = _scan().get(handle._def_name)
+    if scan is None:
+        return default
+    nets, branches = scan
+    nets = set(nets)
+    for cond, (then_nets, then_stored), (else_nets, else_stored) in branches:
+        taken = _elaborated(handle, cond)
+        if taken is None:
+            # Unknown: only names driven without a <= in either branch
+            nets |= (then_nets | else_nets) - then_stored - else_stored
+        elif taken:
+            nets = (nets | then_nets) - then_stored
+        else:
+            nets = (nets | else_nets) - else_stored
+    return nets
+
+def walk_registers(handle, path="", exclude=DEFAULT_EXCLUDE, nets=None):
+    """Yield (path, handle) for every stored value below handle
+
+    Continuously driven nets are skipped: depositing them would only leave a
+    stale value until their driver next changes.
+    """
+    if nets is None:
+        nets = module_nets(handle)
+    for child in handle:
+        name = child._name
+        child_path = f"{path}.{name}" if path else name
+        if child_path in exclude:
+            continue
+        if isinstance(child, HierarchyObject):
+            # Generate scopes have no definition of their own
+            child_nets = module_nets(child, nets) if child._type == "GPI_MODULE" else nets
+            yield from walk_registers(child, child_path, exclude, child_nets)
+        elif isinstance(child, HierarchyArrayObject):
+            for i, scope in enumerate(child):
+                yield from walk_registers(scope, f"{child_path}[{i}]", exclude, nets)
+        elif name in nets:
+            continue
+        elif isinstance(child, ArrayObject):
+            for i, elem in enumerate(child):
+                yield f"{child_path}[{i}]", elem
+        elif isinstance(child, VALUE_TYPES) and not child.is_const:
+            yield child_path, child
+
+def snapshot_model(model):
+    """Copy the STATE_FIELDS of a bus model"""
+    return {f: copy.deepcopy(getattr(model, f)) for f in model.STATE_FIELDS if hasattr(model, f)}
+
+def restore_model(model, state):
+    for f in model.STATE_FIELDS:
+        if f in state:
+            setattr(model, f, copy.deepcopy(state[f]))
+        elif hasattr(model, f):
+            delattr(model, f)  # attribute created after the checkpoint
+    if hasattr(model, "on_restore"):
+        model.on_restore()
+
+class Checkpoint:
+    def __init__(self, rtl, models, sim_time_ns=0):
+        self.rtl = rtl                  # register path -> binary string or int
+        self.models = models            # model name -> state dict
+        self.sim_time_ns = sim_time_ns  # time it took to reach the checkpoint
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "rtl": self.rtl,
+                "models": {n: _to_json(s) for n, s in self.models.items()},
+                "sim_time_ns": self.sim_time_ns,
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        models = {n: _from_json(s) for n, s in data["models"].items()}
+        return cls(data["rtl"], models, data["sim_time_ns"])
+
+def _read(handle):
+    if isinstance(handle, (EnumObject, IntegerObject)):
+        return int(handle.value)
+    return str(handle.value)
+
+def _write(handle, value):
+    if isinstance(value, int) or set(value) <= {"0", "1"}:
+        handle.value = int(value) if isinstance(value, int) else int(value, 2)
+    elif isinstance(handle, LogicObject):
+        handle.value = Logic(value)
+    else:
+        handle.value = LogicArray(value)
+
+async def capture(dut, models, exclude=DEFAULT_EXCLUDE):
+    """Capture RTL registers and model state on the next falling clock edge"""
+    await FallingEdge(dut.clk)
+    rtl = {p: _read(h) for p, h in walk_registers(dut, exclude=exclude)}
+    if not rtl:
+        raise RuntimeError(f"No registers found below {dut._name}, nothing to checkpoint")
+    states = {name: snapshot_model(m) for name, m in models.items()}
+    cocotb.log.info(f"[CHECKPOINT] Captured {len(rtl)} registers, {len(states)} models")
+    return Checkpoint(rtl, states, get_sim_time(unit="ns"))
+
+async def restore(dut, checkpoint, models, exclude=DEFAULT_EXCLUDE):
+    """Restore a checkpoint on the next falling clock edge
+
+    Every deposited register is read back before returning, so a restore
+    that did not take effect fails here instead of silently continuing.
+    """
+    await FallingEdge(dut.clk)
+    handles = dict(walk_registers(dut, exclude=exclude))
+    missing = [p for p in checkpoint.rtl if p not in handles]
+    if missing:
+        raise RuntimeError(f"Checkpoint registers not found in the design: {missing[:5]}")
+    for p, value in checkpoint.rtl.items():
+        _write(handles[p], value)
+    for name, m in models.items():
+        restore_model(m, checkpoint.models[name])
+
+    await ReadOnly()
+    stale = [p for p, value in checkpoint.rtl.items() if _read(handles[p]) != value]
+    if stale:
+        raise RuntimeError(f"{len(stale)} registers did not take the restored value: {stale[:5]}")
+    await Timer(1, unit="ns")  # leave the read-only phase before the caller drives inputs
+
+# --- JSON helpers (bytes and objects are not JSON serialisable) ---
+def _to_json(obj):
+    if isinstance(obj, (bytes, bytearray)):
+        return {"__bytes__": bytes(obj).hex()}
+    if hasattr(obj, "__dict__"):
+        return {"__pickle__": base64.b64encode(pickle.dumps(obj)).decode()}
+    if isinstance(obj, dict):
+        return {"__dict__": [[_to_json(k), _to_json(v)] for k, v in obj.items()]}
+    if isinstance(obj, (list, tuple)):
+        return [_to_json(x) for x in obj]
+    return obj
+
+def _from_json(obj):
+    if isinstance(obj, dict):
+        if "__bytes__" in obj:
+            return bytes.fromhex(obj["__bytes__"])
+        if "__pickle__" in obj:
+            return pickle.loads(base64.b64decode(obj["__pickle__"]))
+        if "__dict__" in obj:
+            return {_from_json(k): _from_json(v) for k, v in obj["__dict__"]}
+        return {k: _from_json(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_from_json(x) for x in obj]
+    return obj
@@ -0,0 +1,388 @@
+"""Cycle-approximate Python golden model of main_core.
+
+Executes the observable behaviour of the Guardian chip at transaction level:
+the nfc_card_detector REQA/ANTICOLL/SELECT sequence, the auth_controller
+AUTH_INIT/AUTH/GET_ID exchange, door/LED outputs and the watchdog, with an
+approximate cycle cost per SPI transaction. The reader side mirrors
+MFRC522_Model in test_main_core.py register for register, so a card (see
+card_emulator.py) fed to both produces the same outcome in this model and
+in the RTL.
+
+Usage:
+    python guardian_model.py --count 1000000 --jobs 8 --out fuzz_seeds.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import time
+
+from card_emulator import CardEmulator, CardProfile, aes_encrypt, aes_decrypt
+
+# MFRC522 Registers
+REG_COMMAND     = 0x01
+REG_COMIRQ      = 0x04
+REG_FIFODATA    = 0x09
+REG_FIFOLEVEL   = 0x0A
+REG_BITFRAMING  = 0x0D
+REG_TXMODE      = 0x12
+REG_RXMODE      = 0x13
+REG_VERSION     = 0x37
+
+# MFRC522 Commands
+PCD_TRANSCEIVE  = 0x0C
+
+# ISO14443A Commands
+PICC_REQA       = 0x26
+PICC_ANTICOLL   = 0x93
+PICC_SELECT     = 0x93
+
+# Detector retry limit (retry_count < 3 in nfc_card_detector)
+REQA_RETRIES    = 3
+
+# --- Approximate cycle costs (main_core defaults, CLKS_PER_HALF_BIT=2) ---
+NFC_ACCESS_CYCLES   = 84           # 2-byte register access incl. CS_INACTIVE
+EEPROM_READ_CYCLES  = 118          # 3-byte READ incl. key FSM handshake
+AES_OP_CYCLES       = 3            # start -> done -> FSM step
+FSM_STEP_CYCLES     = 1            # decision states (CHECK_*, GEN_NONCE, ...)
+IRQ_LATENCY_CYCLES  = 2            # IRQ edge detect -> first command
+TIMEOUT_CYCLES      = 100000000    # main_core TIMEOUT_CYCLES (default)
+
+# Outcomes
+UNLOCK       = "unlock"            # door_unlock / status_unlock asserted
+AUTH_FAIL    = "auth_fail"         # status_fault pulse
+DETECT_ERROR = "detect_error"      # detection_error, back to IDLE
+HANG         = "hang"              # FSM stuck without any output
+
+class Hang(Exception):
+    pass
+
+class FuzzedCard:
+    """Wraps a card and mutates its responses from a seeded RNG.
+
+    The RNG draws depend only on the seed, the transaction index and the
+    response length, never on response contents, so the same seed yields the
+    same mutations in this model and in the RTL bench (where rt differs).
+    """
+    MUTATIONS = ("pass", "pass", "pass", "pass", "flip", "truncate", "extend", "drop", "random")
+
+    def __init__(self, seed, card=None):
+        self.seed = seed
+        self.card = card if card is not None else CardEmulator()
+        self.rng = random.Random(seed)
+        self.log = []                   # mutation applied per transaction
+        self.clean_get_id = True        # GET_ID response left untouched
+
+    def transceive(self, tx):
+        resp = list(self.card.transceive(tx))
+        rng = self.rng
+        kind = rng.choice(self.MUTATIONS)
+        if kind == "flip" and resp:
+            i = rng.randrange(len(resp))
+            resp[i] ^= 1 << rng.randrange(8)
+        elif kind == "truncate" and resp:
+            resp = resp[:rng.randrange(len(resp))]
+        elif kind == "extend":
+            resp = resp + [rng.randrange(256) for _ in range(rng.randrange(1, 18))]
+        elif kind == "drop":
+            resp = []
+        elif kind == "random":
+            resp = [rng.randrange(256) for _ in range(rng.randrange(0, 20))]
+        else:
+            kind = "pass"
+        self.log.append(kind)
+        if len(tx) == 2 and tx[0] == 0x80 and tx[1] == 0x12 and kind != "pass":
+            self.clean_get_id = False
+        return resp
+
+class ReaderModel:
+    """MFRC522 register/FIFO semantics of MFRC522_Model (test_main_core.py)"""
+    def __init__(self, card=None):
+        self.registers = {i: 0x00 for i in range(64)}
+        self.registers[REG_VERSION] = 0x92
+        self.fifo = []
+        self.card = card
+        self.card_present = card is not None
+
+    def write(self, addr, val):
+        if addr == REG_FIFODATA:
+            self.fifo.append(val)
+            self.registers[REG_FIFOLEVEL] = len(self.fifo)
+        elif addr == REG_COMMAND:
+            self.registers[addr] = val
+            if val == PCD_TRANSCEIVE:
+                self.transceive()
+        elif addr == REG_COMIRQ:
+            if val & 0x80:
+                self.registers[addr] |= val & 0x7F
+            else:
+                self.registers[addr] &= ~val & 0x7F
+        else:
+            self.registers[addr] = val
+
+    def read(self, addr):
+        if addr == REG_FIFODATA:
+            val = self.fifo.pop(0) if self.fifo else 0x00
+            self.registers[REG_FIFOLEVEL] = len(self.fifo)
+            return val
+        return self.registers.get(addr, 0x00) & 0xFF
+
+    def transceive(self):
+        tx = self.fifo[:]
+        self.fifo = []
+        self.registers[REG_FIFOLEVEL] = 0
+        if not self.card_present:
+            self.registers[REG_COMIRQ] |= 0x01
+            return
+        response = self.card.transceive(tx)
+        if response:
+            self.fifo = list(response)
+            self.registers[REG_FIFOLEVEL] = len(response)
+            self.registers[REG_COMIRQ] |= 0x20
+        else:
+            self.registers[REG_COMIRQ] |= 0x01
+
+class SessionResult:
+    def __init__(self, outcome, cycles, stage, card_uid=None, card_id=None, reqa_attempts=0):
+        self.outcome = outcome          # UNLOCK / AUTH_FAIL / DETECT_ERROR / HANG
+        self.cycles = cycles            # approx. cycles from IRQ to outcome
+        self.stage = stage              # last protocol stage entered
+        self.card_uid = card_uid        # main_core card_uid (None before CARD_READY)
+        self.card_id = card_id          # decrypted card ID (UNLOCK only)
+        self.reqa_attempts = reqa_attempts
+
+    def signature(self):
+        return (self.outcome, self.stage, self.reqa_attempts)
+
+    def as_dict(self):
+        return {
+            "outcome": self.outcome,
+            "cycles": self.cycles,
+            "stage": self.stage,
+            "card_uid": self.card_uid,
+            "card_id": self.card_id.hex() if self.card_id is not None else None,
+            "reqa_attempts": self.reqa_attempts,
+        }
+
+class GuardianModel:
+    """Transaction-level model of main_core (detector + auth_controller)"""
+    def __init__(self, eeprom, reader, timeout_cycles=TIMEOUT_CYCLES):
+        self.eeprom = list(eeprom)      # AT25010 contents, PSK at 0x00..0x0F
+        self.reader = reader
+        self.timeout_cycles = timeout_cycles
+        self.cycles = 0
+        self.stage = "IDLE"
+        self.reqa_attempts = 0
+        # Detector registers that persist across detections (reset to 0)
+        self.atqa = 0
+        self.uid = 0
+        self.sak = 0
+        # nonce_generator LFSR state
+        self.lfsr = 0xCAFEBEEF12345678
+
+    # --- SPI transactions ---
+    def nfc_write(self, addr, val):
+        self.cycles += NFC_ACCESS_CYCLES
+        self.reader.write(addr, val)
+
+    def nfc_read(self, addr):
+        self.cycles += NFC_ACCESS_CYCLES
+        return self.reader.read(addr)
+
+    def poll_rx_irq(self):
+        # Reading ComIrqReg has no side effects, so a clear RxIRq stays clear
+        if not self.nfc_read(REG_COMIRQ) & 0x20:
+            raise Hang()
+
+    def transceive(self, tx, framing):
+        for b in tx:
+            self.nfc_write(REG_FIFODATA, b)
+        # ST_TX_CLEAR_IRQ / ST_*_CLEAR_IRQ between FIFO and command
+        self.nfc_write(REG_COMIRQ, 0x7F)
+        self.nfc_write(REG_COMMAND, PCD_TRANSCEIVE)
+        self.nfc_write(REG_BITFRAMING, framing)
+        self.poll_rx_irq()
+
+    def nonce(self):
+        # nonce_generator serves a prefetched LFSR/counter mix XORed with the
+        # counter at request time, which depends on the exact cycle. The card
+        # accepts any rt, so only a fresh value is needed here, not the RTL's
+        x = self.lfsr
+        self.lfsr = ((x << 1) & 0xFFFFFFFFFFFFFFFF) | ((x ^ (x >> 1) ^ (x >> 3) ^ (x >> 4)) & 1)
+        counter = (0x12345678 + self.cycles) & 0xFFFFFFFF
+        return (self.lfsr ^ counter).to_bytes(8, "big")
+
+    # --- nfc_card_detector ---
+    def detect(self):
+        self.cycles += IRQ_LATENCY_CYCLES
+        self.stage = "REQA"
+        self.nfc_write(REG_COMIRQ, 0x7F)
+        self.nfc_write(REG_FIFOLEVEL, 0x80)
+        self.nfc_write(REG_TXMODE, 0x00)
+        self.nfc_write(REG_RXMODE, 0x00)
+
+        retry = 0
+        self.reqa_attempts = 0
+        protocol = "REQA"
+        while True:
+            self.stage = protocol
+            if protocol == "REQA":
+                self.reqa_attempts += 1
+                self.transceive([PICC_REQA], 0x87)
+            elif protocol == "ANTICOLL":
+                self.transceive([PICC_ANTICOLL, 0x20], 0x80)
+            else:
+                u = self.uid
+                b3, b2, b1, b0 = (u >> 24) & 0xFF, (u >> 16) & 0xFF, (u >> 8) & 0xFF, u & 0xFF
+                self.transceive([PICC_SELECT, 0x70, b3, b2, b1, b0, b3 ^ b2 ^ b1 ^ b0], 0x80)
+
+            rx_count = self.nfc_read(REG_FIFOLEVEL) & 0x0F
+            if rx_count == 0:
+                # rx_index < rx_count - 1 never terminates for rx_count == 0
+                raise Hang()
+            for i in range(rx_count):
+                data = self.nfc_read(REG_FIFODATA)
+                if protocol == "REQA":
+                    if i == 0: self.atqa = (self.atqa & 0xFF00) | data
+                    if i == 1: self.atqa = (self.atqa & 0x00FF) | (data << 8)
+                elif protocol == "ANTICOLL":
+                    if i < 4: self.uid = (self.uid & ~(0xFF << (8 * i))) | (data << (8 * i))
+                elif i == 0:
+                    self.sak = data
+            self.cycles += FSM_STEP_CYCLES
+
+            if protocol == "REQA":
+                if self.atqa == 0x0004:
+                    protocol = "ANTICOLL"
+                elif retry < REQA_RETRIES:
+                    retry += 1
+                else:
+                    return False
+            elif protocol == "ANTICOLL":
+                protocol = "SELECT"
+            else:
+                return (self.sak & 0x04) == 0
+
+    # --- auth_controller ---
+    def authenticate(self):
+        self.stage = "LOAD_KEY"
+        psk = bytes(self.eeprom[0:16])
+        self.cycles += 16 * EEPROM_READ_CYCLES
+
+        self.stage = "AUTH_INIT"
+        self.transceive([0x80, 0x10], 0x80)
+        self.nfc_read(REG_FIFOLEVEL)
+        encrypted_rc = bytes(self.nfc_read(REG_FIFODATA) for _ in range(16))
+
+        self.stage = "DECRYPT_RC"
+        self.cycles += AES_OP_CYCLES
+        plain = aes_decrypt(psk, encrypted_rc)
+        if plain[8:] != bytes(8):
+            return False, None
+        rc = plain[:8]
+
+        self.cycles += 2 * FSM_STEP_CYCLES
+        rt = self.nonce()
+        self.cycles += AES_OP_CYCLES
+        token = aes_encrypt(psk, rt + rc)
+
+        self.stage = "AUTH"
+        self.transceive([0x80, 0x11] + list(token), 0x80)
+        self.nfc_read(REG_FIFOLEVEL)
+        if self.nfc_read(REG_FIFODATA) == 0xFF:
+            return False, None
+
+        self.stage = "DERIVE_SESSION_KEY"
+        self.cycles += AES_OP_CYCLES
+        session_key = aes_encrypt(psk, rc + rt)
+
+        self.stage = "GET_ID"
+        self.transceive([0x80, 0x12], 0x80)
+        self.nfc_read(REG_FIFOLEVEL)
+        encrypted_id = bytes(self.nfc_read(REG_FIFODATA) for _ in range(16))
+
+        self.stage = "DECRYPT_ID"
+        self.cycles += AES_OP_CYCLES
+        return True, aes_decrypt(session_key, encrypted_id)
+
+    def run_session(self):
+        """Process one card tap (IRQ edge) and return its SessionResult"""
+        self.cycles = 0
+        try:
+            if not self.detect():
+                return SessionResult(DETECT_ERROR, self.cycles, self.stage, reqa_attempts=self.reqa_attempts)
+        except Hang:
+            return SessionResult(HANG, self.cycles, self.stage, reqa_attempts=self.reqa_attempts)
+
+        card_uid = self.uid
+        auth_start = self.cycles
+        try:
+            ok, card_id = self.authenticate()
+        except Hang:
+            # Auth IRQ polling only ends through the watchdog, armed on start_auth
+            return SessionResult(AUTH_FAIL, auth_start + self.timeout_cycles, self.stage, card_uid,
+                                 reqa_attempts=self.reqa_attempts)
+        self.cycles += FSM_STEP_CYCLES
+        if ok:
+            return SessionResult(UNLOCK, self.cycles, self.stage, card_uid, card_id, self.reqa_attempts)
+        return SessionResult(AUTH_FAIL, self.cycles, self.stage, card_uid, reqa_attempts=self.reqa_attempts)
+
+# Default bench setup, matches test_main_core_full_flow
+DEFAULT_PSK = bytes(range(16))
+
+def run_seed(seed, psk=DEFAULT_PSK, timeout_cycles=TIMEOUT_CYCLES):
+    """Run one fuzzed session from reset and return (SessionResult, FuzzedCard)"""
+    card = FuzzedCard(seed, CardEmulator(CardProfile(psk=psk)))
+    eeprom = list(psk) + [0xFF] * (128 - len(psk))
+    model = GuardianModel(eeprom, ReaderModel(card), timeout_cycles)
+    return model.run_session(), card
+
+def fuzz(seeds, psk=DEFAULT_PSK):
+    """Return {signature: first seed} for the given seed range, plus outcome counts"""
+    interesting = {}
+    counts = {}
+    for seed in seeds:
+        result, _ = run_seed(seed, psk)
+        counts[result.outcome] = counts.get(result.outcome, 0) + 1
+        sig = result.signature()
+        if sig not in interesting:
+            interesting[sig] = seed
+    return interesting, counts
+
+def _fuzz_chunk(bounds):
+    return fuzz(range(*bounds))
+
+def main():
+    parser = argparse.ArgumentParser(description="Fuzz the Guardian golden model")
+    parser.add_argument("--count", type=int, default=100000, help="number of seeds")
+    parser.add_argument("--start", type=int, default=0, help="first seed")
+    parser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--out", default="fuzz_seeds.json", help="interesting seeds for test_differential")
+    args = parser.parse_args()
+
+    chunk = max(1, args.count // (args.jobs * 8))
+    bounds = [(s, min(s + chunk, args.start + args.count))
+              for s in range(args.start, args.start + args.count, chunk)]
+
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(args.jobs) as pool:
+        parts = pool.map(_fuzz_chunk, bounds)
+    elapsed = time.perf_counter() - t0
+
+    interesting = {}
+    counts = {}
+    for part_interesting, part_counts in parts:
+        for sig, seed in part_interesting.items():
+            interesting.setdefault(sig, seed)
+        for k, v in part_counts.items():
+            counts[k] = counts.get(k, 0) + v
+
+    print(f"{args.count} sessions in {elapsed:.1f} s ({args.count / elapsed * 60:,.0f} sessions/min)")
+    print(f"Outcomes: {counts}")
+    print(f"Interesting seeds: {len(interesting)}")
+    with open(args.out, "w") as f:
+        json.dump(sorted(interesting.values()), f)
+
+if __name__ == "__main__":
+    main()
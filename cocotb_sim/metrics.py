@@ -0,0 +1,425 @@
+"""Pluggable coverage/metrics collectors for the cocotb benches.
+
+Collectors attach to main_core or any sub-block used as toplevel: each one
+looks up the signals it needs below the dut and is skipped if they are not
+there. Samples are aggregated into preallocated arrays; nothing is
+allocated per event.
+
+Enable from the runner, no test changes needed:
+
+    COLLECTORS=all make main_core          # or e.g. COLLECTORS=fsm,aes
+
+With COLLECTORS set, the Makefile runs this module as the only test module
+and names the bench in METRICS_TESTS. register() imports those modules and
+wraps each of their tests with instrument(), so every test gets a
+CollectorSession; the result does not depend on import order. After each
+test the results are written to metrics.json next to results.xml.
+COLLECTORS=none only measures wall time.
+
+With METRICS_REPEATS=N every test runs 2N times in the same simulation,
+alternating without and with collectors. The overhead is the ratio of the
+median wall times and, with METRICS_MAX_OVERHEAD (fraction), checked.
+"""
+
+import abc
+import functools
+import importlib
+import json
+import os
+import re
+import statistics
+import time
+from array import array
+
+import cocotb
+from cocotb.triggers import Edge, RisingEdge, FallingEdge
+from cocotb.utils import get_sim_time
+
+RTL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rtl")
+
+def enum_states(rtl_file, type_name="state_t"):
+    """State names of a SystemVerilog enum, in encoding order"""
+    with open(os.path.join(RTL_DIR, rtl_file)) as f:
+        src = f.read()
+    m = re.search(r"typedef\s+enum[^{]*\{(.*?)\}\s*" + type_name, src, re.S)
+    body = re.sub(r"//[^\n]*", "", m.group(1))
+    return [name.strip() for name in body.split(",") if name.strip()]
+
+def lookup(dut, path):
+    handle = dut
+    try:
+        for name in path.split("."):
+            handle = getattr(handle, name)
+    except AttributeError:
+        return None
+    return handle
+
+def read_int(handle):
+    try:
+        return int(handle.value)
+    except ValueError:
+        return -1  # X/Z
+
+def zeros(typecode, n):
+    return array(typecode, bytes(array(typecode).itemsize * n))
+
+def summarize(samples, count):
+    """min/mean/percentiles over the first count samples"""
+    if count == 0:
+        return {"n": 0}
+    s = sorted(samples[:min(count, len(samples))])
+    pick = lambda p: s[min(len(s) - 1, int(p * len(s)))]
+    return {"n": count, "min": s[0], "mean": sum(s) / len(s), "p50": pick(0.5),
+            "p90": pick(0.9), "max": s[-1]}
+
+# ============================================
+# Collectors
+# ============================================
+
+class Collector(abc.ABC):
+    name = "collector"
+
+    def __init__(self):
+        self.events = 0         # callbacks handled, for overhead accounting
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    @abc.abstractmethod
+    def result(self):
+        """JSON-serialisable summary of what was collected"""
+
+class FsmCoverage(Collector):
+    """State visits, transitions and time per state of one FSM"""
+    name = "fsm"
+
+    def __init__(self, label, state, states):
+        super().__init__()
+        self.label = label
+        self.state = state
+        self.states = states
+        n = len(states)
+        self.visits = zeros("Q", n)
+        self.transitions = zeros("Q", n * n)
+        self.time_ns = zeros("d", n)
+        self.current = -1
+        self.since = 0.0
+
+    def start(self):
+        super().start()
+        self.current = read_int(self.state)
+        self.since = get_sim_time(unit="ns")
+        if 0 <= self.current < len(self.states):
+            self.visits[self.current] += 1
+        cocotb.start_soon(self.run())
+
+    async def run(self):
+        n = len(self.states)
+        while self.running:
+            await Edge(self.state)
+            new = read_int(self.state)
+            now = get_sim_time(unit="ns")
+            self.events += 1
+            old = self.current
+            if 0 <= old < n:
+                self.time_ns[old] += now - self.since
+                if 0 <= new < n:
+                    self.transitions[old * n + new] += 1
+            if 0 <= new < n:
+                self.visits[new] += 1
+            self.current = new
+            self.since = now
+
+    def stop(self):
+        if self.running and 0 <= self.current < len(self.states):
+            self.time_ns[self.current] += get_sim_time(unit="ns") - self.since
+        super().stop()
+
+    def result(self):
+        n = len(self.states)
+        visited = [s for i, s in enumerate(self.states) if self.visits[i]]
+        arcs = {f"{self.states[i // n]}->{self.states[i % n]}": c
+                for i, c in enumerate(self.transitions) if c}
+        return {
+            "coverage": len(visited) / n,
+            "unvisited": [s for i, s in enumerate(self.states) if not self.visits[i]],
+            "visits": {s: self.visits[i] for i, s in enumerate(self.states) if self.visits[i]},
+            "time_ns": {s: self.time_ns[i] for i, s in enumerate(self.states) if self.visits[i]},
+            "transitions": arcs,
+        }
+
+class SpiCounter(Collector):
+    """Frames (CS assertions) and bytes (SPI master RX_DV pulses) on one bus"""
+    name = "spi"
+
+    def __init__(self, label, cs_n, rx_dv):
+        super().__init__()
+        self.label = label
+        self.cs_n = cs_n
+        self.rx_dv = rx_dv
+        self.counts = zeros("Q", 2)     # frames, bytes
+
+    def start(self):
+        super().start()
+        cocotb.start_soon(self.count(FallingEdge, self.cs_n, 0))
+        cocotb.start_soon(self.count(RisingEdge, self.rx_dv, 1))
+
+    async def count(self, edge, signal, index):
+        while self.running:
+            await edge(signal)
+            self.events += 1
+            self.counts[index] += 1
+
+    def result(self):
+        return {"frames": self.counts[0], "bytes": self.counts[1]}
+
+class AesCounter(Collector):
+    """Encrypt/decrypt operations and start-to-done latency"""
+    name = "aes"
+    CAPACITY = 4096
+
+    def __init__(self, start, mode, done):
+        super().__init__()
+        self.start_sig = start
+        self.mode = mode
+        self.done = done
+        self.ops = zeros("Q", 2)                    # encrypt, decrypt
+        self.latency = zeros("d", self.CAPACITY)    # ring buffer, ns
+        self.count = 0
+        self.t_start = None
+
+    def start(self):
+        super().start()
+        cocotb.start_soon(self.watch_start())
+        cocotb.start_soon(self.watch_done())
+
+    async def watch_start(self):
+        while self.running:
+            await RisingEdge(self.start_sig)
+            self.events += 1
+            self.ops[1 if read_int(self.mode) == 1 else 0] += 1
+            self.t_start = get_sim_time(unit="ns")
+
+    async def watch_done(self):
+        while self.running:
+            await RisingEdge(self.done)
+            self.events += 1
+            if self.t_start is not None:
+                self.latency[self.count % self.CAPACITY] = get_sim_time(unit="ns") - self.t_start
+                self.count += 1
+                self.t_start = None
+
+    def result(self):
+        return {"encrypt": self.ops[0], "decrypt": self.ops[1],
+                "latency_ns": summarize(self.latency, self.count)}
+
+class LatencyTimer(Collector):
+    """Time from a start event to the first of several stop events"""
+    name = "latency"
+    CAPACITY = 4096
+
+    def __init__(self, label, start_sig, stop_sigs):
+        super().__init__()
+        self.label = label
+        self.start_sig = start_sig
+        self.stop_sigs = stop_sigs
+        self.samples = zeros("d", self.CAPACITY)  # ring buffer, ns
+        self.count = 0
+        self.t_start = None
+
+    def start(self):
+        super().start()
+        cocotb.start_soon(self.watch_start())
+        for sig in self.stop_sigs:
+            cocotb.start_soon(self.watch_stop(sig))
+
+    async def watch_start(self):
+        while self.running:
+            await RisingEdge(self.start_sig)
+            self.events += 1
+            self.t_start = get_sim_time(unit="ns")
+
+    async def watch_stop(self, sig):
+        while self.running:
+            await RisingEdge(sig)
+            self.events += 1
+            if self.t_start is not None:
+                self.samples[self.count % self.CAPACITY] = get_sim_time(unit="ns") - self.t_start
+                self.count += 1
+                self.t_start = None
+
+    def result(self):
+        return {"unit": "ns", **summarize(self.samples, self.count)}
+
+# ============================================
+# Collector sets and attachment
+# ============================================
+
+FSMS = [
+    # label, rtl file, state paths (toplevel module name -> "state")
+    ("auth_controller", "auth_controller.v", ["u_auth_controller.state"]),
+    ("nfc_card_detector", "nfc_card_detector.v", ["u_card_detector.state", "u_detector.state"]),
+]
+
+SPI_BUSES = [
+    # label, chip select, SPI master byte-valid pulse
+    ("nfc", "nfc_spi_cs_n", "u_nfc.spi_rx_dv"),
+    ("eeprom", "eeprom_spi_cs_n", "u_eeprom.spi_rx_dv"),
+    ("spi", "spi_cs_n", "spi_rx_dv"),
+    ("spi", "spi_cs_n", "u_interface.spi_rx_dv"),
+]
+
+LATENCY_TIMERS = [
+    # label, start, stops
+    ("detect", "nfc_irq", ["detector_start_auth", "detection_error"]),
+    ("auth", "auth_start", ["auth_success", "auth_failed"]),
+]
+
+ALL = ("fsm", "spi", "aes", "latency")
+
+def build(dut, enabled=ALL):
+    """Instantiate every enabled collector whose signals exist below dut"""
+    collectors = []
+    if "fsm" in enabled:
+        for label, rtl_file, paths in FSMS:
+            if dut._name == label:
+                paths = ["state"]
+            state = next((h for h in (lookup(dut, p) for p in paths) if h is not None), None)
+            if state is not None:
+                collectors.append(FsmCoverage(label, state, enum_states(rtl_file)))
+    if "spi" in enabled:
+        seen = set()
+        for label, cs_path, dv_path in SPI_BUSES:
+            cs_n, rx_dv = lookup(dut, cs_path), lookup(dut, dv_path)
+            if cs_n is not None and rx_dv is not None and label not in seen:
+                seen.add(label)
+                collectors.append(SpiCounter(label, cs_n, rx_dv))
+    if "aes" in enabled:
+        core = dut if dut._name == "aes_core" else lookup(dut, "u_aes_core")
+        if core is not None:
+            collectors.append(AesCounter(core.start, core.mode, core.done))
+    if "latency" in enabled:
+        for label, start_path, stop_paths in LATENCY_TIMERS:
+            start = lookup(dut, start_path)
+            stops = [h for h in (lookup(dut, p) for p in stop_paths) if h is not None]
+            if start is not None and stops:
+                collectors.append(LatencyTimer(label, start, stops))
+    return collectors
+
+class CollectorSession:
+    def __init__(self, dut, enabled=ALL):
+        self.collectors = build(dut, enabled)
+
+    def start(self):
+        for c in self.collectors:
+            c.start()
+
+    def stop(self):
+        for c in self.collectors:
+            c.stop()
+
+    @property
+    def events(self):
+        return sum(c.events for c in self.collectors)
+
+    def results(self):
+        out = {}
+        for c in self.collectors:
+            key = f"{c.name}.{c.label}" if hasattr(c, "label") else c.name
+            out[key] = c.result()
+        return out
+
+# ============================================
+# Runner integration
+# ============================================
+
+def enabled_collectors():
+    value = os.environ.get("COLLECTORS", "all").strip().lower()
+    if value in ("", "none", "0"):
+        return ()
+    if value == "all":
+        return ALL
+    return tuple(v.strip() for v in value.split(","))
+
+def output_path():
+    if "METRICS_FILE" in os.environ:
+        return os.environ["METRICS_FILE"]
+    results = os.environ.get("COCOTB_RESULTS_FILE", "results.xml")
+    return os.path.join(os.path.dirname(os.path.abspath(results)), "metrics.json")
+
+_results = {}
+_walls = {}     # test name -> {"off": [...], "on": [...]} for METRICS_REPEATS
+
+def _export(key, entry):
+    _results[key] = entry
+    with open(output_path(), "w") as f:
+        json.dump(_results, f, indent=2)
+
+def _overhead(name, run, wall):
+    """Record one repeat; return the median overhead once every repeat of name has run"""
+    walls = _walls.setdefault(name, {"off": [], "on": []})
+    walls["on" if run.startswith("on") else "off"].append(wall)
+    repeats = int(os.environ["METRICS_REPEATS"])
+    if len(walls["off"]) < repeats or len(walls["on"]) < repeats:
+        return None
+    off, on = statistics.median(walls["off"]), statistics.median(walls["on"])
+    summary = {"repeats": repeats, "wall_s_median": {"off": off, "on": on},
+               "overhead": on / off - 1}
+    _export(name, summary)
+    cocotb.log.info(f"[METRICS] {name}: median wall {off:.3f}s -> {on:.3f}s "
+                    f"({100 * summary['overhead']:+.1f}%) over {repeats} repeats")
+    return summary["overhead"]
+
+def instrument(test_func):
+    """Wrap a cocotb test coroutine with a CollectorSession"""
+    @functools.wraps(test_func)
+    async def wrapper(dut, *args, metrics_run=None, **kwargs):
+        enabled = enabled_collectors()
+        if metrics_run is not None and not metrics_run.startswith("on"):
+            enabled = ()
+        session = CollectorSession(dut, enabled)
+        session.start()
+        sim_start = get_sim_time(unit="ns")
+        t0 = time.perf_counter()
+        try:
+            await test_func(dut, *args, **kwargs)
+        finally:
+            wall = time.perf_counter() - t0
+            session.stop()
+            name = f"{test_func.__module__}.{test_func.__qualname__}"
+            entry = {
+                "collectors_enabled": list(enabled),
+                "wall_s": wall,
+                "sim_time_ns": get_sim_time(unit="ns") - sim_start,
+                "events": session.events,
+                "collectors": session.results(),
+            }
+            _export(name if metrics_run is None else f"{name}/{metrics_run}", entry)
+        if metrics_run is not None:
+            overhead = _overhead(name, metrics_run, wall)
+            limit = os.environ.get("METRICS_MAX_OVERHEAD")
+            if limit and overhead is not None:
+                assert overhead <= float(limit), \
+                    f"Collector overhead {100 * overhead:.1f}% above {100 * float(limit):.0f}%"
+    return wrapper
+
+def register(module_names):
+    """Import the test modules and expose their tests, instrumented, from this module"""
+    repeats = int(os.environ.get("METRICS_REPEATS", "0"))
+    runs = [f"{state}{i}" for i in range(repeats) for state in ("off", "on")]
+    for module_name in module_names:
+        module = importlib.import_module(module_name)
+        for obj_name, obj in list(vars(module).items()):
+            # cocotb.test() returns a generator object that keeps the coroutine in .func
+            if not (hasattr(obj, "func") and hasattr(obj, "generate_tests")):
+                continue
+            obj.func = instrument(obj.func)
+            if runs:
+                cocotb.parametrize(metrics_run=runs)(obj)
+            globals()[f"{module_name}.{obj_name}"] = obj
+
+register(m for m in os.environ.get("METRICS_TESTS", "").split(",") if m)
@@ -33,6 +33,9 @@ module nfc_detector_wrapper (
         .card_uid(card_uid),
         .card_ready(card_ready),
         .start_auth(start_auth),
+        .auth_success(1'b0),
+        .auth_failed(1'b0),
+        .session_active(),
         .nfc_cmd_valid(nfc_cmd_valid),
         .nfc_cmd_ready(nfc_cmd_ready),
         .nfc_cmd_write(nfc_cmd_write),
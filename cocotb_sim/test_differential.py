@@ -0,0 +1,110 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, FallingEdge, Timer, First
+from cocotb.utils import get_sim_time
+import json
+import os
+
+import checkpoint
+import guardian_model as gm
+from card_emulator import CardEmulator, CardProfile
+import test_main_core as tmc
+
+# Written by `python guardian_model.py --out fuzz_seeds.json`
+SEEDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fuzz_seeds.json")
+FALLBACK_SEEDS = 5000          # seeds fuzzed in-test when no seed file exists
+SESSION_TIMEOUT_NS = 500000    # no output within this window (plus the watchdog) counts as a hang
+MAX_CYCLE_ERROR = 0.10         # mean |rtl - model| / rtl over sessions with matching outcome
+
+def load_seeds():
+    if os.path.exists(SEEDS_FILE):
+        with open(SEEDS_FILE) as f:
+            return json.load(f)
+    interesting, _ = gm.fuzz(range(FALLBACK_SEEDS))
+    return sorted(interesting.values())
+
+@cocotb.test()
+async def test_differential_fuzz_replay(dut):
+    """Replay interesting golden-model seeds against the RTL and compare outcomes"""
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+
+    eeprom = tmc.AT25010_Model(dut)
+    nfc = tmc.MFRC522_Model(dut)
+    models = {"eeprom": eeprom, "nfc": nfc}
+    for i, b in enumerate(gm.DEFAULT_PSK):
+        eeprom.memory[i] = b
+
+    dut.rst_n.value = 0
+    dut.nfc_irq.value = 0
+    await Timer(100, unit="ns")
+    dut.rst_n.value = 1
+    await Timer(100, unit="ns")
+
+    # Every seed starts from the same post-reset state
+    ckpt = await checkpoint.capture(dut, models)
+
+    # A hang during authentication ends through the watchdog; `make differential`
+    # builds main_core with a short TIMEOUT_CYCLES so those seeds finish quickly
+    timeout_cycles = int(dut.TIMEOUT_CYCLES.value)
+    window_ns = SESSION_TIMEOUT_NS + timeout_cycles * 10
+
+    seeds = load_seeds()
+    mismatches = []
+    cycle_error = 0.0
+    timed = 0
+
+    for seed in seeds:
+        expected, _ = gm.run_seed(seed, timeout_cycles=timeout_cycles)
+
+        await checkpoint.restore(dut, ckpt, models)
+        card = gm.FuzzedCard(seed, CardEmulator(CardProfile(psk=gm.DEFAULT_PSK)))
+        nfc.card = card
+        nfc.card_present = True
+
+        start = get_sim_time(unit="ns")
+        dut.nfc_irq.value = 1
+        await Timer(100, unit="ns")
+        dut.nfc_irq.value = 0
+
+        unlock = RisingEdge(dut.door_unlock)
+        fault = RisingEdge(dut.status_fault)
+        det_error = RisingEdge(dut.detection_error)
+        fired = await First(unlock, fault, det_error, Timer(window_ns, unit="ns"))
+        if fired is unlock:
+            outcome = gm.UNLOCK
+        elif fired is fault:
+            outcome = gm.AUTH_FAIL
+        elif fired is det_error:
+            outcome = gm.DETECT_ERROR
+        else:
+            outcome = gm.HANG
+        cycles = (get_sim_time(unit="ns") - start) / 10
+        await FallingEdge(dut.clk)
+
+        problems = []
+        if outcome != expected.outcome:
+            problems.append(f"outcome rtl={outcome} model={expected.outcome}")
+        if outcome in (gm.UNLOCK, gm.AUTH_FAIL) and expected.card_uid is not None:
+            if int(dut.card_uid.value) != expected.card_uid:
+                problems.append(f"card_uid rtl={int(dut.card_uid.value):08x} model={expected.card_uid:08x}")
+        if outcome == gm.UNLOCK and expected.card_id == card.card.profile.card_id:
+            if int(dut.card_id.value) != int.from_bytes(expected.card_id, "big"):
+                problems.append("card_id mismatch")
+        if outcome == expected.outcome and outcome != gm.HANG:
+            cycle_error += abs(cycles - expected.cycles) / max(cycles, 1)
+            timed += 1
+
+        cocotb.log.info(f"[seed {seed}] {outcome} ({expected.stage}) rtl={cycles:.0f} cyc "
+                        f"model={expected.cycles} cyc mutations={card.log}")
+        if problems:
+            cocotb.log.error(f"[seed {seed}] MISMATCH: {'; '.join(problems)}")
+            mismatches.append(seed)
+
+    assert not mismatches, f"RTL and golden model disagree for seeds {mismatches}"
+    assert timed, "No session with a matching outcome to compare cycle estimates"
+    mean_error = cycle_error / timed
+    cocotb.log.info(f"Mean cycle-estimate error: {100 * mean_error:.1f}% over {timed} sessions")
+    assert mean_error <= MAX_CYCLE_ERROR, \
+        f"Golden model cycle estimate off by {100 * mean_error:.1f}% on average (limit {100 * MAX_CYCLE_ERROR:.0f}%)"
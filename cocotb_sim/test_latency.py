@@ -0,0 +1,133 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, FallingEdge, Timer, First
+from cocotb.utils import get_sim_time
+import json
+import os
+
+import checkpoint
+from card_emulator import CardEmulator, CardTiming, PROFILES
+import test_main_core as tmc
+
+# Samples per profile, override with LATENCY_SAMPLES=<n> make latency
+SAMPLES = int(os.environ.get("LATENCY_SAMPLES", "5"))
+SESSION_TIMEOUT_NS = 40_000_000   # well above the ~12 ms card-side budget
+REPORT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "latency_report.json")
+
+EEPROM_PSK = bytes(range(16))
+
+# Profile -> expected outcome with EEPROM_PSK provisioned
+PROFILE_OUTCOMES = {
+    "alice": "unlock",
+    "bob": "unlock",
+    "carol": "auth_fail",   # different PSK
+    "cloned": "auth_fail",  # alice's UID, wrong key
+}
+
+# (name, profile, fault, expected outcome, expected card_id correct)
+FAULT_SCENARIOS = [
+    ("bit_error_auth_init", "alice", ("bit_error", "AUTH_INIT", {"bits": 3}), "auth_fail", None),
+    ("late_auth",           "alice", ("late", "AUTH", {"extra_us": 5000}),    "unlock",    True),
+    ("truncate_get_id",     "alice", ("truncate", "GET_ID", {"keep": 8}),     "unlock",    False),
+]
+
+def percentile(values, p):
+    s = sorted(values)
+    k = (len(s) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(s) - 1)
+    return s[lo] + (s[hi] - s[lo]) * (k - lo)
+
+def distribution(values):
+    if not values:
+        return None
+    return {
+        "n": len(values),
+        "min": min(values),
+        "median": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "max": max(values),
+        "mean": sum(values) / len(values),
+    }
+
+async def run_session(dut, nfc, card):
+    """Present a card, return (outcome, latency in us from IRQ to result)"""
+    nfc.card = card
+    nfc.card_present = True
+    start = get_sim_time(unit="ns")
+    dut.nfc_irq.value = 1
+    await Timer(100, unit="ns")
+    dut.nfc_irq.value = 0
+
+    unlock = RisingEdge(dut.door_unlock)
+    fault = RisingEdge(dut.status_fault)
+    det_error = RisingEdge(dut.detection_error)
+    fired = await First(unlock, fault, det_error, Timer(SESSION_TIMEOUT_NS, unit="ns"))
+    latency_us = (get_sim_time(unit="ns") - start) / 1000
+    await FallingEdge(dut.clk)
+    if fired is unlock:
+        return "unlock", latency_us
+    if fired is fault:
+        return "auth_fail", latency_us
+    if fired is det_error:
+        return "detect_error", latency_us
+    return "hang", latency_us
+
+def card_id_ok(dut, card):
+    return int(dut.card_id.value) == int.from_bytes(card.profile.card_id, "big")
+
+@cocotb.test()
+async def test_card_latency_benchmark(dut):
+    """IRQ-to-unlock latency distributions for several card profiles with RF timing"""
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+
+    eeprom = tmc.AT25010_Model(dut)
+    nfc = tmc.MFRC522_Model(dut)
+    models = {"eeprom": eeprom, "nfc": nfc}
+    for i, b in enumerate(EEPROM_PSK):
+        eeprom.memory[i] = b
+
+    dut.rst_n.value = 0
+    dut.nfc_irq.value = 0
+    await Timer(100, unit="ns")
+    dut.rst_n.value = 1
+    await Timer(100, unit="ns")
+
+    ckpt = await checkpoint.capture(dut, models)
+    report = {"samples": SAMPLES, "profiles": {}, "faults": {}}
+
+    for name, expected in PROFILE_OUTCOMES.items():
+        latencies = []
+        commands = {}
+        for sample in range(SAMPLES):
+            await checkpoint.restore(dut, ckpt, models)
+            card = CardEmulator(PROFILES[name], CardTiming(), seed=sample)
+            outcome, latency_us = await run_session(dut, nfc, card)
+            assert outcome == expected, f"{name} sample {sample}: {outcome}, expected {expected}"
+            if outcome == "unlock":
+                assert card_id_ok(dut, card), f"{name} sample {sample}: wrong card_id"
+            latencies.append(latency_us)
+            for cmd, n in card.stats.items():
+                commands[str(cmd)] = commands.get(str(cmd), 0) + n
+        dist = distribution(latencies)
+        report["profiles"][name] = {"outcome": expected, "latency_us": dist, "commands": commands}
+        cocotb.log.info(f"[{name}] {expected}: min={dist['min']:.0f} median={dist['median']:.0f} "
+                        f"p90={dist['p90']:.0f} max={dist['max']:.0f} us")
+
+    for name, profile, (kind, command, params), expected, id_ok in FAULT_SCENARIOS:
+        await checkpoint.restore(dut, ckpt, models)
+        card = CardEmulator(PROFILES[profile], CardTiming(), seed=0)
+        card.inject(kind, command, **params)
+        outcome, latency_us = await run_session(dut, nfc, card)
+        cocotb.log.info(f"[fault {name}] {outcome} after {latency_us:.0f} us")
+        assert outcome == expected, f"fault {name}: {outcome}, expected {expected}"
+        if id_ok is not None:
+            assert card_id_ok(dut, card) == id_ok, f"fault {name}: card_id check"
+        report["faults"][name] = {"fault": kind, "command": command, "outcome": outcome,
+                                  "latency_us": latency_us}
+
+    with open(REPORT_FILE, "w") as f:
+        json.dump(report, f, indent=2)
+    cocotb.log.info(f"Latency report written to {REPORT_FILE}")
@@ -1,10 +1,13 @@
 import cocotb
 from cocotb.clock import Clock
-from cocotb.triggers import RisingEdge, FallingEdge, Timer, Event
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+from cocotb.triggers import RisingEdge, FallingEdge, Timer, Event, First, with_timeout
+from cocotb.utils import get_sim_time
 import os
 
+import checkpoint
+import metrics
+from card_emulator import CardEmulator, CardProfile, CardResponse
+
 # --- Constants ---
 # MFRC522 Registers
 REG_COMMAND     = 0x01
@@ -46,20 +49,15 @@ CMD_AUTH_INIT   = 0x80
 CMD_AUTH        = 0x81 # Assuming
 CMD_GET_ID      = 0x82 # Assuming
 
-# --- Helper Functions ---
-def aes_encrypt(key, data):
-    cipher = Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend())
-    encryptor = cipher.encryptor()
-    return encryptor.update(data) + encryptor.finalize()
-
-def aes_decrypt(key, data):
-    cipher = Cipher(algorithms.AES(key), modes.ECB(), backend=default_backend())
-    decryptor = cipher.decryptor()
-    return decryptor.update(data) + decryptor.finalize()
+# auth_controller FSM encoding, read from state_t in rtl/auth_controller.v
+ST_AUTH_INIT_FIFO = metrics.enum_states("auth_controller.v").index("ST_AUTH_INIT_FIFO")
 
 # --- Models ---
 
 class AT25010_Model:
+    # Attributes captured by checkpoint.snapshot_model()
+    STATE_FIELDS = ("memory", "status", "wel")
+
     def __init__(self, dut):
         self.dut = dut
         self.memory = [0xFF] * 128
@@ -92,30 +90,38 @@ class AT25010_Model:
     async def spi_read_byte(self):
         data = 0
         for _ in range(8):
-            await RisingEdge(self.dut.eeprom_spi_sclk)
+            # Abort on CS release (e.g. checkpoint restore mid-transaction)
+            await First(RisingEdge(self.dut.eeprom_spi_sclk), RisingEdge(self.dut.eeprom_spi_cs_n))
             if self.dut.eeprom_spi_cs_n.value == 1: raise Exception()
             data = (data << 1) | int(self.dut.eeprom_spi_mosi.value)
         return data
 
     async def spi_write_byte(self, data):
         for i in range(8):
-            await FallingEdge(self.dut.eeprom_spi_sclk)
+            await First(FallingEdge(self.dut.eeprom_spi_sclk), RisingEdge(self.dut.eeprom_spi_cs_n))
             if self.dut.eeprom_spi_cs_n.value == 1: raise Exception()
             self.dut.eeprom_spi_miso.value = (data >> (7 - i)) & 1
 
 class MFRC522_Model:
-    def __init__(self, dut):
+    # Attributes captured by checkpoint.snapshot_model()
+    STATE_FIELDS = ("registers", "fifo", "card_present", "card")
+
+    def __init__(self, dut, card=None, rx_timeout_us=25000):
         self.dut = dut
         self.registers = {i: 0x00 for i in range(64)}
         self.registers[REG_VERSION] = 0x92
         self.fifo = []
         self.dut.nfc_spi_miso.value = 0
         self.card_present = False
-        self.card_uid = [0x01, 0x02, 0x03, 0x04]
-        self.psk = bytes([0x00]*16) # Default PSK
-        self.card_id = bytes([0xAA]*16)
+        # Card in the field: CardEmulator, or any object with transceive(tx) -> response
+        self.card = card if card is not None else CardEmulator()
+        self.rx_timeout_us = rx_timeout_us  # reader timer for timed responses
+        self.rx_token = None                # identifies the receive in progress
         cocotb.start_soon(self.run())
 
+    def on_restore(self):
+        self.rx_token = None # Drop receives started before a checkpoint restore
+
     async def run(self):
         while True:
             await FallingEdge(self.dut.nfc_spi_cs_n)
@@ -141,6 +147,12 @@ class MFRC522_Model:
                     elif addr == REG_COMMAND:
                         self.registers[addr] = val
                         await self.process_command(val)
+                    elif addr == REG_COMIRQ:
+                        # Set1 (bit 7) sets the marked bits, otherwise they are cleared
+                        if val & 0x80:
+                            self.registers[addr] |= val & 0x7F
+                        else:
+                            self.registers[addr] &= ~val & 0x7F
                     else:
                         self.registers[addr] = val
             except Exception as e:
@@ -151,14 +163,15 @@ class MFRC522_Model:
     async def spi_read_byte(self):
         data = 0
         for _ in range(8):
-            await RisingEdge(self.dut.nfc_spi_sclk)
+            # Abort on CS release (e.g. checkpoint restore mid-transaction)
+            await First(RisingEdge(self.dut.nfc_spi_sclk), RisingEdge(self.dut.nfc_spi_cs_n))
             if self.dut.nfc_spi_cs_n.value == 1: raise Exception()
             data = (data << 1) | int(self.dut.nfc_spi_mosi.value)
         return data
 
     async def spi_write_byte(self, data):
         for i in range(8):
-            await FallingEdge(self.dut.nfc_spi_sclk)
+            await First(FallingEdge(self.dut.nfc_spi_sclk), RisingEdge(self.dut.nfc_spi_cs_n))
             if self.dut.nfc_spi_cs_n.value == 1: raise Exception()
             self.dut.nfc_spi_miso.value = (data >> (7 - i)) & 1
 
@@ -169,6 +182,7 @@ class MFRC522_Model:
             tx_data = self.fifo[:]
             self.fifo = [] # Clear FIFO after TX
             self.registers[REG_FIFOLEVEL] = 0
+            self.rx_token = None
             
             cocotb.log.info(f"[MFRC522] Transmitting: {[hex(x) for x in tx_data]}")
             
@@ -178,78 +192,51 @@ class MFRC522_Model:
                 return
 
             # Card Logic
-            response = []
-            
-            if len(tx_data) == 1 and tx_data[0] == PICC_REQA:
-                cocotb.log.info("[Card] Received REQA -> Sending ATQA")
-                response = [0x04, 0x00] # ATQA
-                
-            elif len(tx_data) == 2 and tx_data[0] == PICC_ANTICOLL and tx_data[1] == 0x20:
-                cocotb.log.info("[Card] Received ANTICOLL -> Sending UID")
-                # UID + BCC
-                bcc = 0
-                for b in self.card_uid: bcc ^= b
-                response = self.card_uid + [bcc]
-                
-            elif len(tx_data) >= 2 and tx_data[0] == PICC_SELECT:
-                cocotb.log.info("[Card] Received SELECT -> Sending SAK")
-                response = [0x08, 0xB6, 0xDD] # SAK + CRC (Dummy CRC)
-                
-            elif len(tx_data) == 2 and tx_data[0] == 0x80 and tx_data[1] == 0x10:
-                cocotb.log.info("[Card] Received AUTH_INIT -> Sending Encrypted Challenge")
-                # Generate Challenge (RC)
-                rc = bytes([0x11, 0x22, 0x33, 0x44, 0x55, 0x66, 0x77, 0x88])
-                padding = bytes([0x00]*8)
-                plaintext = rc + padding
-                # Encrypt with PSK
-                ciphertext = aes_encrypt(self.psk, plaintext)
-                response = list(ciphertext)
-                self.last_rc = rc
-                
-            elif len(tx_data) == 18 and tx_data[0] == 0x80 and tx_data[1] == 0x11:
-                # AUTH command: 0x80 0x11 + 16 bytes encrypted data
-                cocotb.log.info("[Card] Received AUTH -> Verifying Challenge")
-                encrypted_data = bytes(tx_data[2:])
-                decrypted = aes_decrypt(self.psk, encrypted_data)
-                
-                # Decrypted should be rt || rc
-                rt = decrypted[:8]
-                rc_received = decrypted[8:]
-                
-                if rc_received == self.last_rc:
-                    cocotb.log.info("[Card] Authentication Successful")
-                    response = [0x00] # Success
-                    
-                    # Derive Session Key: E_psk(rc || rt)
-                    plaintext = rc_received + rt
-                    self.session_key = aes_encrypt(self.psk, plaintext)
-                else:
-                    cocotb.log.info(f"[Card] Auth Failed. Expected RC: {self.last_rc.hex()}, Got: {rc_received.hex()}")
-                    response = [0xFF] # Fail
-
-            elif len(tx_data) == 2 and tx_data[0] == 0x80 and tx_data[1] == 0x12:
-                # GET_ID command
-                cocotb.log.info("[Card] Received GET_ID -> Sending Encrypted ID")
-                if hasattr(self, 'session_key'):
-                    # Encrypt Card ID with Session Key
-                    encrypted_id = aes_encrypt(self.session_key, self.card_id)
-                    response = list(encrypted_id)
-                else:
-                    response = [0xFF] # Not authenticated
-
+            if hasattr(self.card, "respond"):
+                reply = self.card.respond(tx_data)
+            else:
+                reply = CardResponse(list(self.card.transceive(tx_data)))
+            if reply.fault:
+                cocotb.log.info(f"[Card] Injected fault on {reply.command}: {reply.fault}")
             
-            # Put response in FIFO
-            if response:
-                self.fifo = response
-                self.registers[REG_FIFOLEVEL] = len(response)
+            if reply.latency_us or reply.byte_us:
+                # Timed receive: RxIRq/TimerIRq are set when the frame is in or the timer
+                # expires. Like the chip, ComIrqReg is only ever cleared by the host.
+                self.rx_token = object()
+                cocotb.start_soon(self.receive(reply, self.rx_token))
+            elif reply.data:
+                # Put response in FIFO
+                self.fifo = list(reply.data)
+                self.registers[REG_FIFOLEVEL] = len(reply.data)
                 self.registers[REG_COMIRQ] |= 0x20 # RxIRq (Receive Complete)
-                cocotb.log.info(f"[MFRC522] Received Response: {[hex(x) for x in response]}")
+                cocotb.log.info(f"[MFRC522] Received Response: {[hex(x) for x in reply.data]}")
             else:
                 # Timeout
                 self.registers[REG_COMIRQ] |= 0x01
 
         elif cmd == PCD_IDLE:
-            pass # Stop current command
+            self.rx_token = None # Stop current command
+
+    async def receive(self, reply, token):
+        # Card answers after its latency, bytes then fill the FIFO one by one
+        if not reply.data or reply.latency_us > self.rx_timeout_us:
+            await Timer(round(self.rx_timeout_us * 1000), unit="ns")
+            if self.rx_token is token:
+                self.registers[REG_COMIRQ] |= 0x01 # TimerIRq (Timeout)
+            return
+        if reply.latency_us:
+            await Timer(round(reply.latency_us * 1000), unit="ns")
+        for i, b in enumerate(reply.data):
+            if self.rx_token is not token:
+                return
+            if i and reply.byte_us:
+                await Timer(round(reply.byte_us * 1000), unit="ns")
+                if self.rx_token is not token:
+                    return
+            self.fifo.append(b)
+            self.registers[REG_FIFOLEVEL] = len(self.fifo)
+        self.registers[REG_COMIRQ] |= 0x20 # RxIRq (Receive Complete)
+        cocotb.log.info(f"[MFRC522] Received Response: {[hex(x) for x in reply.data]}")
 
 @cocotb.test()
 async def test_main_core_full_flow(dut):
@@ -258,14 +245,13 @@ async def test_main_core_full_flow(dut):
     clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
     cocotb.start_soon(clock.start())
     
-    # Initialize Models
-    eeprom = AT25010_Model(dut)
-    nfc = MFRC522_Model(dut)
-    
     # Setup PSK in EEPROM
     psk = bytes([0x00, 0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07, 
                  0x08, 0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x0E, 0x0F])
-    nfc.psk = psk # Give card the same key
+    
+    # Initialize Models (give card the same key)
+    eeprom = AT25010_Model(dut)
+    nfc = MFRC522_Model(dut, CardEmulator(CardProfile(psk=psk)))
     for i, b in enumerate(psk):
         eeprom.memory[i] = b
         
@@ -332,3 +318,73 @@ async def test_main_core_full_flow(dut):
         # So if it fails, it fails.
         assert False, "Door did not unlock. Authentication failed or stuck."
 
+
+async def wait_for_auth_state(dut, state):
+    while int(dut.u_auth_controller.state.value) != state:
+        await FallingEdge(dut.clk)
+
+@cocotb.test()
+async def test_main_core_checkpoint_scenarios(dut):
+    """Fork several scenarios from one 'card selected, key loaded' checkpoint"""
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+
+    psk = bytes([0x00, 0x01, 0x02, 0x03, 0x04, 0x05, 0x06, 0x07,
+                 0x08, 0x09, 0x0A, 0x0B, 0x0C, 0x0D, 0x0E, 0x0F])
+
+    eeprom = AT25010_Model(dut)
+    nfc = MFRC522_Model(dut, CardEmulator(CardProfile(psk=psk)))
+    models = {"eeprom": eeprom, "nfc": nfc}
+    for i, b in enumerate(psk):
+        eeprom.memory[i] = b
+
+    # Reset, detection and PSK load are simulated exactly once
+    dut.rst_n.value = 0
+    dut.nfc_irq.value = 0
+    await Timer(100, unit="ns")
+    dut.rst_n.value = 1
+    await Timer(100, unit="ns")
+
+    nfc.card_present = True
+    dut.nfc_irq.value = 1
+    await Timer(100, unit="ns")
+    dut.nfc_irq.value = 0
+
+    await with_timeout(wait_for_auth_state(dut, ST_AUTH_INIT_FIFO), 500000, "ns")
+    ckpt = await checkpoint.capture(dut, models)
+    cocotb.log.info(f"Checkpoint 'card selected, key loaded' reached after {ckpt.sim_time_ns:.0f} ns")
+
+    def use_wrong_psk():
+        nfc.card.profile.psk = bytes([0xFF] * 16)
+
+    def use_other_card_id():
+        nfc.card.profile.card_id = bytes(range(16))
+
+    scenarios = [
+        ("valid card",       None,              True),
+        ("wrong card PSK",   use_wrong_psk,     False),
+        ("other card ID",    use_other_card_id, True),
+        ("valid card again", None,              True),
+    ]
+
+    for name, setup, expect_unlock in scenarios:
+        await checkpoint.restore(dut, ckpt, models)
+        assert int(dut.u_auth_controller.state.value) == ST_AUTH_INIT_FIFO, \
+            f"Scenario '{name}': RTL not rewound to the checkpoint"
+        if setup:
+            setup()
+        start = get_sim_time(unit="ns")
+
+        await with_timeout(
+            First(RisingEdge(dut.door_unlock), RisingEdge(dut.status_fault)), 500000, "ns")
+        unlocked = dut.door_unlock.value == 1
+        elapsed = get_sim_time(unit="ns") - start
+        cocotb.log.info(f"[{name}] unlocked={unlocked} after {elapsed:.0f} ns "
+                        f"(bring-up skipped: {ckpt.sim_time_ns:.0f} ns)")
+
+        assert unlocked == expect_unlock, f"Scenario '{name}': expected unlock={expect_unlock}"
+        if unlocked:
+            await FallingEdge(dut.clk)
+            assert int(dut.card_id.value) == int.from_bytes(nfc.card.profile.card_id, "big"), \
+                f"Scenario '{name}': card ID mismatch"
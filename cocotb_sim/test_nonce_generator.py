@@ -0,0 +1,157 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, FallingEdge, ReadOnly, Timer
+import os
+import random
+
+# Draws for the statistics check, override with NONCE_DRAWS=<n> make nonce
+DRAWS = int(os.environ.get("NONCE_DRAWS", "2000"))
+
+async def reset(dut):
+    dut.req.value = 0
+    dut.rst_n.value = 0
+    await Timer(50, unit="ns")
+    dut.rst_n.value = 1
+
+async def wait_cycles(dut, n):
+    for _ in range(n):
+        await RisingEdge(dut.clk)
+
+async def draw(dut):
+    """One-cycle request, returns (served in request cycle, nonce)"""
+    await FallingEdge(dut.clk)
+    dut.req.value = 1
+    await ReadOnly()
+    same_cycle = int(dut.valid.value) == 1
+    value = int(dut.nonce.value) if same_cycle else None
+    await RisingEdge(dut.clk)
+    await FallingEdge(dut.clk)
+    dut.req.value = 0
+    if not same_cycle:
+        await ReadOnly()
+        assert int(dut.valid.value) == 1, "Nonce not delivered the cycle after an underflow"
+        value = int(dut.nonce.value)
+    return same_cycle, value
+
+@cocotb.test()
+async def test_nonce_single_cycle(dut):
+    """Requests on a full queue are served in the same cycle, bursts count underflows"""
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+    await reset(dut)
+
+    depth = int(dut.DEPTH.value)
+    mix_cycles = int(dut.MIX_CYCLES.value)
+    await wait_cycles(dut, depth * mix_cycles + 10)
+
+    same_cycle, _ = await draw(dut)
+    assert same_cycle, "Request on a full queue was not served in the same cycle"
+    assert int(dut.underflow_count.value) == 0
+
+    # Back-to-back requests drain the queue
+    await wait_cycles(dut, depth * mix_cycles + 10)
+    await FallingEdge(dut.clk)
+    delivered = 0
+    dut.req.value = 1
+    for _ in range(depth + 4):
+        await ReadOnly()
+        if int(dut.valid.value) == 1:
+            delivered += 1  # from the queue, or late for the previous request
+        await RisingEdge(dut.clk)
+        await FallingEdge(dut.clk)
+    dut.req.value = 0
+    await ReadOnly()
+    if int(dut.valid.value) == 1:
+        delivered += 1
+    underflows = int(dut.underflow_count.value)
+    cocotb.log.info(f"Burst of {depth + 4}: {delivered} delivered, {underflows} underflows")
+    assert underflows >= 1, "Burst longer than the queue did not underflow"
+    assert underflows <= 4, "Prefetched entries not served back to back"
+    assert delivered == depth + 4, "Every request must produce exactly one nonce"
+
+@cocotb.test()
+async def test_nonce_statistics(dut):
+    """Bit balance, uniqueness and avalanche across many draws at random times"""
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+    await reset(dut)
+
+    depth = int(dut.DEPTH.value)
+    mix_cycles = int(dut.MIX_CYCLES.value)
+    rng = random.Random(0)
+    await wait_cycles(dut, depth * mix_cycles + 10)
+
+    values = []
+    for _ in range(DRAWS):
+        same_cycle, value = await draw(dut)
+        assert same_cycle, "Spaced requests should never underflow"
+        values.append(value)
+        await wait_cycles(dut, rng.randrange(mix_cycles, 5 * mix_cycles))
+
+    assert int(dut.underflow_count.value) == 0
+    assert len(set(values)) == len(values), "Repeated nonce"
+
+    ones = [sum((v >> b) & 1 for v in values) / len(values) for b in range(64)]
+    total = sum(ones) / 64
+    hamming = [bin(a ^ b).count("1") for a, b in zip(values, values[1:])]
+    mean_hd = sum(hamming) / len(hamming)
+    cocotb.log.info(f"{DRAWS} draws: ones={total:.4f} per-bit=[{min(ones):.3f}, {max(ones):.3f}] "
+                    f"mean Hamming distance={mean_hd:.2f}")
+
+    assert 0.48 < total < 0.52, f"Bit balance off: {total}"
+    assert all(0.4 < p < 0.6 for p in ones), "Biased bit position"
+    assert 30 < mean_hd < 34, f"Consecutive nonces too similar: {mean_hd}"
+
+@cocotb.test()
+async def test_nonce_low_power_hold(dut):
+    """With LOW_POWER, a full and idle queue stops the mixer; draws still differ"""
+
+    if not int(dut.LOW_POWER.value):
+        cocotb.log.info("LOW_POWER=0, mixer runs continuously")
+        return
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+    await reset(dut)
+
+    depth = int(dut.DEPTH.value)
+    mix_cycles = int(dut.MIX_CYCLES.value)
+    await wait_cycles(dut, depth * mix_cycles + 10)
+
+    held = [int(dut.lfsr.value), int(dut.mix.value)] + [int(e.value) for e in dut.entries]
+    await wait_cycles(dut, 1000)
+    await ReadOnly()
+    assert [int(dut.lfsr.value), int(dut.mix.value)] + [int(e.value) for e in dut.entries] == held, \
+        "Mixer or queue toggled while the queue was full and idle"
+
+    values = []
+    for _ in range(4 * depth):
+        same_cycle, value = await draw(dut)
+        assert same_cycle
+        values.append(value)
+        await wait_cycles(dut, depth * mix_cycles + 10)
+    assert len(set(values)) == len(values), "Repeated nonce after idle periods"
+
+@cocotb.test()
+async def test_nonce_reset_request_time(dut):
+    """The first nonces after reset depend on the request time, not only on the reset state"""
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+
+    depth = int(dut.DEPTH.value)
+    mix_cycles = int(dut.MIX_CYCLES.value)
+    runs = []
+    for delay in (0, 137):
+        await reset(dut)
+        await wait_cycles(dut, depth * mix_cycles + 10 + delay)
+        first = []
+        for _ in range(depth):
+            same_cycle, value = await draw(dut)
+            assert same_cycle
+            first.append(value)
+        runs.append(first)
+    cocotb.log.info(f"First nonces after reset: {[hex(v) for v in runs[0]]} vs {[hex(v) for v in runs[1]]}")
+    assert all(a != b for a, b in zip(*runs)), "Nonce repeated across resets with different request times"
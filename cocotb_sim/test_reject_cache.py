@@ -0,0 +1,138 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, FallingEdge, Timer, First
+from cocotb.utils import get_sim_time
+
+from card_emulator import CardEmulator, CardProfile
+import test_main_core as tmc
+
+PSK = bytes(range(16))
+WRONG_PSK = bytes([0xFF] * 16)
+SESSION_TIMEOUT_NS = 1_000_000
+
+def denied_card(n):
+    return CardProfile(f"denied{n}", (0xD0, 0x00, 0x00, n), WRONG_PSK)
+
+VALID_CARD = CardProfile("valid", (0x01, 0x02, 0x03, 0x04), PSK)
+
+class ActivityMonitor:
+    """Counts EEPROM chip selects and AES operations"""
+    def __init__(self, dut):
+        self.dut = dut
+        self.eeprom_cs = 0
+        self.aes_ops = 0
+        cocotb.start_soon(self.count_eeprom())
+        cocotb.start_soon(self.count_aes())
+
+    async def count_eeprom(self):
+        while True:
+            await FallingEdge(self.dut.eeprom_spi_cs_n)
+            self.eeprom_cs += 1
+
+    async def count_aes(self):
+        while True:
+            await RisingEdge(self.dut.aes_start)
+            self.aes_ops += 1
+
+    def snapshot(self):
+        return (self.eeprom_cs, self.aes_ops)
+
+async def tap(dut, nfc, profile, card=None):
+    """Present a card (a fresh emulator unless given), return (outcome, duration in ns)"""
+    nfc.card = card if card is not None else CardEmulator(profile)
+    nfc.card_present = True
+    start = get_sim_time(unit="ns")
+    dut.nfc_irq.value = 1
+    await Timer(100, unit="ns")
+    dut.nfc_irq.value = 0
+
+    unlock = RisingEdge(dut.door_unlock)
+    fault = RisingEdge(dut.status_fault)
+    fired = await First(unlock, fault, Timer(SESSION_TIMEOUT_NS, unit="ns"))
+    duration = get_sim_time(unit="ns") - start
+    assert fired is unlock or fired is fault, f"No result for card {profile.name}"
+
+    # Let detector and auth controller return to idle
+    nfc.card_present = False
+    await Timer(10000, unit="ns")
+    return ("unlock" if fired is unlock else "fault"), duration
+
+@cocotb.test()
+async def test_reject_cache(dut):
+    """Denied UIDs are rejected without EEPROM/AES until evicted or expired"""
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+
+    depth = int(dut.REJECT_CACHE_DEPTH.value)
+    holdoff_ns = int(dut.REJECT_HOLDOFF_CYCLES.value) * 10
+    assert depth >= 2, "Test needs a cache with at least 2 entries"
+
+    eeprom = tmc.AT25010_Model(dut)
+    nfc = tmc.MFRC522_Model(dut)
+    for i, b in enumerate(PSK):
+        eeprom.memory[i] = b
+    monitor = ActivityMonitor(dut)
+
+    dut.rst_n.value = 0
+    dut.nfc_irq.value = 0
+    await Timer(100, unit="ns")
+    dut.rst_n.value = 1
+    await Timer(100, unit="ns")
+
+    # 1. A watchdog timeout is a failure, but not a denial: nothing is cached
+    silent = CardEmulator(denied_card(0))
+    silent.inject("late", "AUTH_INIT", extra_us=1_000_000)  # past the reader timer, RxIRq never set
+    outcome, _ = await tap(dut, nfc, denied_card(0), silent)
+    assert outcome == "fault"
+    assert int(dut.reject_cache_inserts.value) == 0, "Timeout was cached as a denial"
+
+    # 2. First denial runs the full authentication and is cached
+    outcome, full_ns = await tap(dut, nfc, denied_card(0))
+    assert outcome == "fault"
+    assert int(dut.reject_cache_inserts.value) == 1
+    assert int(dut.reject_cache_hits.value) == 0
+    deny_time = get_sim_time(unit="ns")
+
+    # 3. Retap is rejected right after detection
+    before = monitor.snapshot()
+    outcome, fast_ns = await tap(dut, nfc, denied_card(0))
+    assert outcome == "fault"
+    assert monitor.snapshot() == before, "Cached reject touched EEPROM or AES"
+    assert int(dut.reject_cache_hits.value) == 1
+    assert int(dut.reject_cache_inserts.value) == 1
+    cocotb.log.info(f"Full denial {full_ns} ns, cached reject {fast_ns} ns")
+    assert fast_ns < full_ns
+
+    # 4. Other cards are unaffected
+    outcome, _ = await tap(dut, nfc, VALID_CARD)
+    assert outcome == "unlock"
+
+    # 5. A full cache evicts the least recently used UID
+    for n in range(1, depth):
+        outcome, _ = await tap(dut, nfc, denied_card(n))
+        assert outcome == "fault"
+    outcome, _ = await tap(dut, nfc, denied_card(0))  # hit makes card 0 most recent
+    assert int(dut.reject_cache_hits.value) == 2
+    outcome, _ = await tap(dut, nfc, denied_card(depth))  # evicts card 1
+    assert outcome == "fault"
+    outcome, _ = await tap(dut, nfc, denied_card(0))
+    assert outcome == "fault"
+    assert int(dut.reject_cache_hits.value) == 3, "Recently used UID was evicted"
+
+    before = monitor.snapshot()
+    inserts = int(dut.reject_cache_inserts.value)
+    outcome, _ = await tap(dut, nfc, denied_card(1))
+    assert outcome == "fault"
+    assert monitor.snapshot() != before, "Evicted UID was not authenticated again"
+    assert int(dut.reject_cache_inserts.value) == inserts + 1
+    assert get_sim_time(unit="ns") - deny_time < holdoff_ns, "Hold-off expired during the test"
+
+    # 6. After the hold-off the UID goes through authentication again
+    await Timer(holdoff_ns, unit="ns")
+    hits = int(dut.reject_cache_hits.value)
+    before = monitor.snapshot()
+    outcome, _ = await tap(dut, nfc, denied_card(0))
+    assert outcome == "fault"
+    assert monitor.snapshot() != before, "Expired UID was still rejected from the cache"
+    assert int(dut.reject_cache_hits.value) == hits
@@ -0,0 +1,230 @@
+import cocotb
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, FallingEdge, Timer, with_timeout
+from cocotb.utils import get_sim_time
+import json
+import os
+
+from card_emulator import CardEmulator, CardProfile, ST_HALT
+import metrics
+import test_main_core as tmc
+
+# Shared between the baseline and SESSION_MODE runs of `make session`
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "session_throughput.json")
+
+USERS = int(os.environ.get("SESSION_USERS", "4"))
+DWELL_US = 400         # card stays on the reader after its unlock
+GAP_US = 20            # next user arrives after the previous card left
+IRQ_PERIOD_US = 100    # reader re-raises IRQ while a card is in the field
+USER_TIMEOUT_US = 5000
+WUPA_DELAY_US = 150    # late WUPA answer in test_presence_late_wupa (poll limit is 500 us)
+
+PSK = bytes(range(16))
+
+# nfc_card_detector states in which a new IRQ is picked up
+DET_STATES = metrics.enum_states("nfc_card_detector.v")
+DET_ST_IDLE = DET_STATES.index("ST_IDLE")
+DET_ST_SESSION = DET_STATES.index("ST_SESSION")
+
+def user_profile(i):
+    return CardProfile(f"user{i}", (0x10 + i, 0x20, 0x30, 0x40 + i), PSK, bytes([0x10 + i] * 16))
+
+class Counters:
+    """Counts detector auth starts, AES operations and NFC SPI frames"""
+    def __init__(self, dut):
+        self.dut = dut
+        self.auth_runs = 0
+        self.aes_ops = 0
+        self.nfc_frames = 0
+        cocotb.start_soon(self.count(dut.detector_start_auth, "auth_runs"))
+        cocotb.start_soon(self.count(dut.aes_start, "aes_ops"))
+        cocotb.start_soon(self.count_falling(dut.nfc_spi_cs_n, "nfc_frames"))
+
+    async def count(self, signal, name):
+        while True:
+            await RisingEdge(signal)
+            setattr(self, name, getattr(self, name) + 1)
+
+    async def count_falling(self, signal, name):
+        while True:
+            await FallingEdge(signal)
+            setattr(self, name, getattr(self, name) + 1)
+
+def can_take_irq(dut):
+    # An IRQ while the auth controller owns the NFC bus would start a colliding detection
+    state = int(dut.u_card_detector.state.value)
+    return not int(dut.status_busy.value) and state in (DET_ST_IDLE, DET_ST_SESSION)
+
+async def pulse_irq(dut):
+    while not can_take_irq(dut):
+        await Timer(1, unit="us")
+    dut.nfc_irq.value = 1
+    await Timer(100, unit="ns")
+    dut.nfc_irq.value = 0
+
+async def reader_irq(dut, nfc):
+    """Re-raise IRQ periodically while a card is in the field and the chip can take it"""
+    while True:
+        await Timer(IRQ_PERIOD_US, unit="us")
+        if nfc.card_present and can_take_irq(dut):
+            await pulse_irq(dut)
+
+async def wait_authenticated(dut, profile):
+    expected = int.from_bytes(profile.card_id, "big")
+    while True:
+        await RisingEdge(dut.auth_success)
+        await FallingEdge(dut.clk)
+        if int(dut.card_id_valid.value) and int(dut.card_id.value) == expected:
+            return
+
+@cocotb.test()
+async def test_multi_user_throughput(dut):
+    """Back-to-back users, each leaving the card on the reader, with and without SESSION_MODE"""
+
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+
+    session_mode = int(dut.SESSION_MODE.value)
+    label = "session" if session_mode else "baseline"
+
+    eeprom = tmc.AT25010_Model(dut)
+    nfc = tmc.MFRC522_Model(dut)
+    for i, b in enumerate(PSK):
+        eeprom.memory[i] = b
+
+    dut.rst_n.value = 0
+    dut.nfc_irq.value = 0
+    await Timer(100, unit="ns")
+    dut.rst_n.value = 1
+    await Timer(100, unit="ns")
+
+    counters = Counters(dut)
+    cocotb.start_soon(reader_irq(dut, nfc))
+
+    start = get_sim_time(unit="ns")
+    latencies = []
+    for i in range(USERS):
+        profile = user_profile(i)
+        nfc.card = CardEmulator(profile)
+        nfc.card_present = True
+        arrival = get_sim_time(unit="ns")
+        cocotb.start_soon(pulse_irq(dut))
+
+        await with_timeout(wait_authenticated(dut, profile), USER_TIMEOUT_US, "us")
+        latencies.append((get_sim_time(unit="ns") - arrival) / 1000)
+        cocotb.log.info(f"[{label}] {profile.name} authenticated after {latencies[-1]:.1f} us")
+
+        await Timer(DWELL_US, unit="us")
+        nfc.card_present = False
+        await Timer(GAP_US, unit="us")
+
+    total_us = (get_sim_time(unit="ns") - start) / 1000
+    result = {
+        "users": USERS,
+        "total_us": total_us,
+        "users_per_s": USERS / (total_us / 1e6),
+        "latency_us": latencies,
+        "mean_latency_us": sum(latencies) / len(latencies),
+        "auth_runs": counters.auth_runs,
+        "aes_ops": counters.aes_ops,
+        "nfc_frames": counters.nfc_frames,
+    }
+    cocotb.log.info(f"[{label}] {result}")
+
+    results = {}
+    if os.path.exists(RESULTS_FILE):
+        with open(RESULTS_FILE) as f:
+            results = json.load(f)
+    results[label] = result
+    with open(RESULTS_FILE, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if session_mode:
+        assert counters.auth_runs == USERS, f"Present cards were re-authenticated: {counters.auth_runs} runs"
+        if "baseline" in results:
+            baseline = results["baseline"]
+            cocotb.log.info(f"Throughput {baseline['users_per_s']:.0f} -> {result['users_per_s']:.0f} users/s, "
+                            f"auth runs {baseline['auth_runs']} -> {result['auth_runs']}, "
+                            f"AES ops {baseline['aes_ops']} -> {result['aes_ops']}, "
+                            f"NFC frames {baseline['nfc_frames']} -> {result['nfc_frames']}")
+            assert result["aes_ops"] < baseline["aes_ops"]
+            assert result["total_us"] <= baseline["total_us"]
+
+async def start_session(dut):
+    """Reset, authenticate user 0 and wait until its card is halted as the session card"""
+    clock = Clock(dut.clk, 10, unit="ns") # 100 MHz
+    cocotb.start_soon(clock.start())
+
+    eeprom = tmc.AT25010_Model(dut)
+    nfc = tmc.MFRC522_Model(dut)
+    for i, b in enumerate(PSK):
+        eeprom.memory[i] = b
+
+    dut.rst_n.value = 0
+    dut.nfc_irq.value = 0
+    await Timer(100, unit="ns")
+    dut.rst_n.value = 1
+    await Timer(100, unit="ns")
+
+    counters = Counters(dut)
+    profile = user_profile(0)
+    card = CardEmulator(profile)
+    nfc.card = card
+    nfc.card_present = True
+    await pulse_irq(dut)
+    await with_timeout(wait_authenticated(dut, profile), USER_TIMEOUT_US, "us")
+    while int(dut.u_card_detector.state.value) != DET_ST_SESSION:
+        await Timer(1, unit="us")
+    return nfc, card, counters
+
+@cocotb.test()
+async def test_presence_late_wupa(dut):
+    """Presence REQA times out, the halted card answers the following WUPA late"""
+
+    if not int(dut.SESSION_MODE.value):
+        cocotb.log.info("SESSION_MODE=0, no presence checks")
+        return
+
+    nfc, card, counters = await start_session(dut)
+
+    # The halted card ignores REQA (TimerIRq), then answers WUPA well within PRESENCE_TIMEOUT_CYCLES
+    card.inject("late", "WUPA", extra_us=WUPA_DELAY_US)
+    wupas = card.stats.get("WUPA", 0)
+    halts = card.stats.get("HALT", 0)
+    await pulse_irq(dut)
+
+    async def presence_check_done():
+        while card.stats.get("WUPA", 0) == wupas:
+            await Timer(1, unit="us")
+        while int(dut.u_card_detector.state.value) not in (DET_ST_IDLE, DET_ST_SESSION):
+            await Timer(1, unit="us")
+    await with_timeout(presence_check_done(), USER_TIMEOUT_US, "us")
+
+    assert int(dut.session_active.value), "Card answering WUPA late was taken as gone"
+    assert card.stats.get("HALT", 0) == halts + 1, "Session card was not halted again"
+    assert counters.auth_runs == 1
+
+@cocotb.test()
+async def test_presence_swapped_card(dut):
+    """Another halted card answers the presence WUPA: it is authenticated, not halted"""
+
+    if not int(dut.SESSION_MODE.value):
+        cocotb.log.info("SESSION_MODE=0, no presence checks")
+        return
+
+    nfc, card, counters = await start_session(dut)
+
+    # Swap the session card for a card halted elsewhere: it ignores REQA but answers WUPA
+    profile = user_profile(1)
+    swapped = CardEmulator(profile)
+    swapped.state = ST_HALT
+    nfc.card = swapped
+    await pulse_irq(dut)
+    await with_timeout(wait_authenticated(dut, profile), USER_TIMEOUT_US, "us")
+    while int(dut.u_card_detector.state.value) != DET_ST_SESSION:
+        await Timer(1, unit="us")
+
+    assert swapped.stats.get("SELECT", 0) == 1, "Swapped card was not selected"
+    assert int(dut.card_uid.value) == int.from_bytes(bytes(profile.uid), "little")
+    assert int(dut.session_active.value)
+    assert counters.auth_runs == 2
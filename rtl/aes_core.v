@@ -1,4 +1,6 @@
-module aes_core (
+module aes_core #(
+  parameter LOW_POWER = 0            // 1 = latch operands on start, isolate unused path
+)(
   input  logic         clk,
   input  logic         rst_n,
   input  logic         start,        // Start encryption/decryption
@@ -13,22 +15,61 @@ module aes_core (
   logic [127:0] decrypt_out;
   logic         done_reg;
 
+  // Operands seen by the combinational AES datapaths
+  logic [127:0] enc_key;
+  logic [127:0] enc_in;
+  logic [127:0] dec_key;
+  logic [127:0] dec_in;
+  logic         out_mode;
+
+  generate
+    if (LOW_POWER) begin : g_operand_isolation
+      // Operand isolation: inputs are captured only on start and only into
+      // the path selected by mode. The other path keeps its last operands,
+      // so neither combinational AES block toggles while idle.
+      always_ff @(posedge clk or negedge rst_n) begin
+        if (!rst_n) begin
+          enc_key  <= 128'h0;
+          enc_in   <= 128'h0;
+          dec_key  <= 128'h0;
+          dec_in   <= 128'h0;
+          out_mode <= 1'b0;
+        end else if (start) begin
+          out_mode <= mode;
+          if (mode) begin
+            dec_key <= key;
+            dec_in  <= block_in;
+          end else begin
+            enc_key <= key;
+            enc_in  <= block_in;
+          end
+        end
+      end
+    end else begin : g_direct_operands
+      assign enc_key  = key;
+      assign enc_in   = block_in;
+      assign dec_key  = key;
+      assign dec_in   = block_in;
+      assign out_mode = mode;
+    end
+  endgenerate
+
   // Instantiate AES Encrypt
   AES_Encrypt u_aes_encrypt (
-    .in       (block_in),
-    .key      (key),
+    .in       (enc_in),
+    .key      (enc_key),
     .out      (encrypt_out)
   );
 
   // Instantiate AES Decrypt
   AES_Decrypt u_aes_decrypt (
-    .in       (block_in),
-    .key      (key),
+    .in       (dec_in),
+    .key      (dec_key),
     .out      (decrypt_out)
   );
 
   // Select output based on mode
-  assign block_out = mode ? decrypt_out : encrypt_out;
+  assign block_out = out_mode ? decrypt_out : encrypt_out;
 
   // Simple done signal generation (combinational AES needs 1 cycle)
   always_ff @(posedge clk or negedge rst_n) begin
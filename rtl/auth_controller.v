@@ -10,6 +10,7 @@ module auth_controller (
   input  logic         start_auth,      // Start authentication sequence
   output logic         auth_success,    // Authentication successful
   output logic         auth_failed,     // Authentication failed
+  output logic         auth_rejected,   // With auth_failed: card failed the challenge (not a timeout)
   output logic         auth_busy,       // Authentication in progress
   
   // Card ID output
@@ -71,6 +72,7 @@ module auth_controller (
     
     // AUTH_INIT Sequence
     ST_AUTH_INIT_FIFO,
+    ST_AUTH_INIT_CLEAR_IRQ,
     ST_AUTH_INIT_CMD,
     ST_AUTH_INIT_FRAMING,
     ST_AUTH_INIT_IRQ,
@@ -86,6 +88,7 @@ module auth_controller (
     
     // AUTH Sequence
     ST_AUTH_FIFO,
+    ST_AUTH_CLEAR_IRQ,
     ST_AUTH_CMD,
     ST_AUTH_FRAMING,
     ST_AUTH_IRQ,
@@ -97,6 +100,7 @@ module auth_controller (
     
     // GET_ID Sequence
     ST_GET_ID_FIFO,
+    ST_GET_ID_CLEAR_IRQ,
     ST_GET_ID_CMD,
     ST_GET_ID_FRAMING,
     ST_GET_ID_IRQ,
@@ -120,6 +124,7 @@ module auth_controller (
   logic [127:0] encrypted_id;           // Encrypted card ID
   logic [3:0]   key_byte_counter;       // Counter for loading 16-byte key
   logic [7:0]   fifo_byte_counter;      // Counter for FIFO operations
+  logic         crypto_reject;          // Bad challenge padding or AUTH answered 0xFF
   
   // Key loading from EEPROM (16 bytes starting at address 0x00)
   localparam [6:0] KEY_BASE_ADDR = 7'h00;
@@ -176,10 +181,14 @@ module auth_controller (
             if (fifo_byte_counter == 0) // Sent 0x80, now send 0x10
                 next_state = ST_AUTH_INIT_FIFO;
             else
-                next_state = ST_AUTH_INIT_CMD;
+                next_state = ST_AUTH_INIT_CLEAR_IRQ;
         end
       end
       
+      ST_AUTH_INIT_CLEAR_IRQ: begin
+        if (nfc_cmd_done) next_state = ST_AUTH_INIT_CMD;
+      end
+      
       ST_AUTH_INIT_CMD: begin
         if (nfc_cmd_done) next_state = ST_AUTH_INIT_FRAMING;
       end
@@ -247,12 +256,16 @@ module auth_controller (
             // Wait for write
         end else if (nfc_cmd_done) begin
             if (fifo_byte_counter >= 17) // 0x80, 0x11, + 16 bytes
-                next_state = ST_AUTH_CMD;
+                next_state = ST_AUTH_CLEAR_IRQ;
             else
                 next_state = ST_AUTH_FIFO;
         end
       end
       
+      ST_AUTH_CLEAR_IRQ: begin
+        if (nfc_cmd_done) next_state = ST_AUTH_CMD;
+      end
+      
       ST_AUTH_CMD: begin
         if (nfc_cmd_done) next_state = ST_AUTH_FRAMING;
       end
@@ -300,12 +313,16 @@ module auth_controller (
             // Wait
         end else if (nfc_cmd_done) begin
             if (fifo_byte_counter >= 1) // 0x80, 0x12
-                next_state = ST_GET_ID_CMD;
+                next_state = ST_GET_ID_CLEAR_IRQ;
             else
                 next_state = ST_GET_ID_FIFO;
         end
       end
       
+      ST_GET_ID_CLEAR_IRQ: begin
+        if (nfc_cmd_done) next_state = ST_GET_ID_CMD;
+      end
+      
       ST_GET_ID_CMD: begin
         if (nfc_cmd_done) next_state = ST_GET_ID_FRAMING;
       end
@@ -362,9 +379,11 @@ module auth_controller (
       card_id <= 128'h0;
       key_byte_counter <= 4'h0;
       fifo_byte_counter <= 8'h0;
+      crypto_reject <= 1'b0;
       
       auth_success <= 1'b0;
       auth_failed <= 1'b0;
+      auth_rejected <= 1'b0;
       card_id_valid <= 1'b0;
       
       aes_start <= 1'b0;
@@ -393,11 +412,13 @@ module auth_controller (
       timeout_start <= 1'b0;
       auth_success <= 1'b0;
       auth_failed <= 1'b0;
+      auth_rejected <= 1'b0;
       
       case (state)
         ST_IDLE: begin
           card_id_valid <= 1'b0;
           key_byte_counter <= 4'h0;
+          crypto_reject <= 1'b0;
           if (start_auth) begin
             timeout_start <= 1'b1;
           end
@@ -453,6 +474,15 @@ module auth_controller (
             end
         end
         
+        ST_AUTH_INIT_CLEAR_IRQ: begin
+            if (nfc_cmd_ready && !nfc_cmd_valid) begin
+                nfc_cmd_valid <= 1'b1;
+                nfc_cmd_write <= 1'b1;
+                nfc_cmd_addr <= REG_COMIRQ;
+                nfc_cmd_wdata <= 8'h7F; // Clear all interrupts, RxIRq must come from this frame
+            end
+        end
+        
         ST_AUTH_INIT_CMD: begin
             if (nfc_cmd_ready && !nfc_cmd_valid) begin
                 nfc_cmd_valid <= 1'b1;
@@ -513,8 +543,10 @@ module auth_controller (
             rc <= aes_block_out[127:64];  // Upper 8 bytes
             if (aes_block_out[63:0] == 64'h0)
               $display("[%0t] [CHIP] ✓ Challenge valid | rc=%h", $time, aes_block_out[127:64]);
-            else
+            else begin
+              crypto_reject <= 1'b1;
               $display("[%0t] [CHIP] ✗ Wrong key (padding=%h)", $time, aes_block_out[63:0]);
+            end
           end
         end
         
@@ -557,6 +589,15 @@ module auth_controller (
             end
         end
         
+        ST_AUTH_CLEAR_IRQ: begin
+            if (nfc_cmd_ready && !nfc_cmd_valid) begin
+                nfc_cmd_valid <= 1'b1;
+                nfc_cmd_write <= 1'b1;
+                nfc_cmd_addr <= REG_COMIRQ;
+                nfc_cmd_wdata <= 8'h7F; // Clear all interrupts, RxIRq must come from this frame
+            end
+        end
+        
         ST_AUTH_CMD: begin
             if (nfc_cmd_ready && !nfc_cmd_valid) begin
                 nfc_cmd_valid <= 1'b1;
@@ -598,6 +639,8 @@ module auth_controller (
                 nfc_cmd_write <= 1'b0;
                 nfc_cmd_addr <= REG_FIFODATA;
             end
+            if (nfc_cmd_done && nfc_cmd_rdata == 8'hFF)
+                crypto_reject <= 1'b1;  // Card rejected our token
         end
         
         ST_DERIVE_SESSION_KEY: begin
@@ -627,6 +670,15 @@ module auth_controller (
             end
         end
         
+        ST_GET_ID_CLEAR_IRQ: begin
+            if (nfc_cmd_ready && !nfc_cmd_valid) begin
+                nfc_cmd_valid <= 1'b1;
+                nfc_cmd_write <= 1'b1;
+                nfc_cmd_addr <= REG_COMIRQ;
+                nfc_cmd_wdata <= 8'h7F; // Clear all interrupts, RxIRq must come from this frame
+            end
+        end
+        
         ST_GET_ID_CMD: begin
             if (nfc_cmd_ready && !nfc_cmd_valid) begin
                 nfc_cmd_valid <= 1'b1;
@@ -695,6 +747,8 @@ module auth_controller (
         
         ST_FAILED: begin
           auth_failed <= 1'b1;
+          // Watchdog failures leave crypto_reject clear
+          auth_rejected <= crypto_reject;
         end
       endcase
     end
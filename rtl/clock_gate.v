@@ -0,0 +1,21 @@
+// Clock Gate Module
+// Behavioural model of a latch-based integrated clock gating (ICG) cell.
+// The enable is sampled while clk is low, so gclk never glitches and an
+// enable raised in the same cycle as a request still passes the next edge.
+
+module clock_gate (
+  input  logic clk,
+  input  logic en,
+  output logic gclk
+);
+
+  logic en_latch;
+
+  // Transparent-low latch
+  always @(clk or en) begin
+    if (!clk) en_latch <= en;
+  end
+
+  assign gclk = clk & en_latch;
+
+endmodule
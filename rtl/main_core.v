@@ -2,7 +2,14 @@
 // Integrates all components for LAYR Authentication System
 
 module main_core #(
-  parameter UNLOCK_DURATION_PARAM = 32'd500000000 // 5 seconds at 100MHz (default)
+  parameter UNLOCK_DURATION_PARAM = 32'd500000000, // 5 seconds at 100MHz (default)
+  parameter LOW_POWER             = 0,             // 1 = idle low-power mode (gating, isolation)
+  parameter SLOW_TICK_DIV         = 256,           // Prescaler for wait-state timers in LOW_POWER
+  parameter REJECT_CACHE_DEPTH    = 0,             // Recently denied UIDs kept (0 = no cache)
+  parameter REJECT_HOLDOFF_CYCLES = 32'd200000000, // Denied UID is rejected for 2 seconds at 100MHz
+  parameter SESSION_MODE          = 0,             // 1 = halt and track the authenticated card
+  parameter PRESENCE_CHECK_CYCLES = 32'd10000000,  // Session presence check interval (100 ms)
+  parameter TIMEOUT_CYCLES        = 32'd100000000  // Authentication timeout, 1 second at 100MHz
 )(
   // System signals
   input  logic         clk,
@@ -29,11 +36,16 @@ module main_core #(
   // Status indicators
   output logic         status_unlock,    // Green LED - door unlocked
   output logic         status_fault,     // Red LED - authentication failed
-  output logic         status_busy       // Yellow LED - busy authenticating
+  output logic         status_busy,      // Yellow LED - busy authenticating
+  
+  // Reject cache monitoring
+  output logic [15:0]  reject_cache_hits,    // Retaps rejected without authentication
+  output logic [15:0]  reject_cache_inserts  // Denied UIDs added to the cache
 );
 
-  // Authentication timeout (in clock cycles)
-  localparam TIMEOUT_CYCLES = 32'd100000000; // 1 second at 100MHz
+  // Wait-state timers count slow ticks; without LOW_POWER every cycle is a tick
+  localparam TICK_DIV      = LOW_POWER ? SLOW_TICK_DIV : 1;
+  localparam TIMEOUT_TICKS = (TIMEOUT_CYCLES + TICK_DIV - 1) / TICK_DIV;
   
   // ============================================
   // Internal signals
@@ -46,6 +58,7 @@ module main_core #(
   logic         detector_start_auth;
   logic         detection_error;
   logic [7:0]   error_code;
+  logic         session_active;
   
   // NFC signals - shared between detector and auth controller
   logic         det_nfc_cmd_valid;
@@ -59,8 +72,10 @@ module main_core #(
   
   // AuthController signals
   logic         auth_start;
+  logic [31:0]  auth_uid;
   logic         auth_success;
   logic         auth_failed;
+  logic         auth_rejected;
   logic         auth_busy;
   logic [127:0] card_id;
   logic         card_id_valid;
@@ -129,13 +144,31 @@ module main_core #(
   logic         door_unlock_reg;
   logic [31:0]  unlock_timer;
   localparam    UNLOCK_DURATION = UNLOCK_DURATION_PARAM;
+  localparam    UNLOCK_TICKS    = (UNLOCK_DURATION + TICK_DIV - 1) / TICK_DIV;
+  
+  // Slow tick for wait states
+  logic         slow_tick;
+  logic         timers_active;
+  
+  // Reject cache
+  logic         cache_hit;
+  logic         cache_reject;
+  
+  // Clocks for the SPI interface blocks (gated in LOW_POWER)
+  logic         eeprom_clk;
+  logic         nfc_clk;
+  logic         eeprom_clk_en;
+  logic         nfc_clk_en;
   
   // ============================================
   // Component instantiations
   // ============================================
   
   // NFC Card Detector - handles ISO14443A card detection
-  nfc_card_detector u_card_detector (
+  nfc_card_detector #(
+    .SESSION_MODE          (SESSION_MODE),
+    .PRESENCE_CHECK_CYCLES (PRESENCE_CHECK_CYCLES)
+  ) u_card_detector (
     .clk              (clk),
     .rst_n            (rst_n),
     .nfc_irq          (nfc_irq),
@@ -143,6 +176,9 @@ module main_core #(
     .card_uid         (card_uid),
     .card_ready       (card_ready),
     .start_auth       (detector_start_auth),
+    .auth_success     (auth_success && card_id_valid),
+    .auth_failed      (auth_failed || cache_reject),
+    .session_active   (session_active),
     .nfc_cmd_valid    (det_nfc_cmd_valid),
     .nfc_cmd_ready    (nfc_cmd_ready),
     .nfc_cmd_write    (det_nfc_cmd_write),
@@ -154,8 +190,54 @@ module main_core #(
     .error_code       (error_code)
   );
   
-  // Start authentication when detector signals card is ready
-  assign auth_start = detector_start_auth;
+  // Start authentication when detector signals card is ready,
+  // unless the UID was denied within the hold-off time
+  assign auth_start = detector_start_auth && !cache_hit;
+  
+  // ============================================
+  // Recently Denied Card Cache
+  // ============================================
+  
+  // UID of the card being authenticated
+  always_ff @(posedge clk or negedge rst_n) begin
+    if (!rst_n) begin
+      auth_uid <= 32'h0;
+    end else if (auth_start) begin
+      auth_uid <= card_uid;
+    end
+  end
+  
+  generate
+    if (REJECT_CACHE_DEPTH > 0) begin : g_reject_cache
+      reject_cache #(
+        .DEPTH          (REJECT_CACHE_DEPTH),
+        .HOLDOFF_CYCLES (REJECT_HOLDOFF_CYCLES)
+      ) u_reject_cache (
+        .clk            (clk),
+        .rst_n          (rst_n),
+        .lookup_uid     (card_uid),
+        .lookup_valid   (detector_start_auth),
+        .hit            (cache_hit),
+        .insert_uid     (auth_uid),
+        .insert_valid   (auth_failed && auth_rejected),
+        .hit_count      (reject_cache_hits),
+        .insert_count   (reject_cache_inserts)
+      );
+    end else begin : g_no_reject_cache
+      assign cache_hit            = 1'b0;
+      assign reject_cache_hits    = 16'h0;
+      assign reject_cache_inserts = 16'h0;
+    end
+  endgenerate
+  
+  // Fault pulse for a cached rejection (EEPROM and AES stay untouched)
+  always_ff @(posedge clk or negedge rst_n) begin
+    if (!rst_n) begin
+      cache_reject <= 1'b0;
+    end else begin
+      cache_reject <= cache_hit;
+    end
+  end
   
   // Authentication Controller
   auth_controller u_auth_controller (
@@ -164,6 +246,7 @@ module main_core #(
     .start_auth       (auth_start),
     .auth_success     (auth_success),
     .auth_failed      (auth_failed),
+    .auth_rejected    (auth_rejected),
     .auth_busy        (auth_busy),
     .card_id          (card_id),
     .card_id_valid    (card_id_valid),
@@ -192,7 +275,9 @@ module main_core #(
   );
   
   // AES Core (with encrypt/decrypt support)
-  aes_core u_aes_core (
+  aes_core #(
+    .LOW_POWER        (LOW_POWER)
+  ) u_aes_core (
     .clk              (clk),
     .rst_n            (rst_n),
     .start            (aes_start),
@@ -204,12 +289,15 @@ module main_core #(
   );
   
   // Nonce Generator
-  nonce_generator u_nonce_gen (
+  nonce_generator #(
+    .LOW_POWER        (LOW_POWER)
+  ) u_nonce_gen (
     .clk              (clk),
     .rst_n            (rst_n),
     .req              (nonce_req),
     .valid            (nonce_valid),
-    .nonce            (nonce)
+    .nonce            (nonce),
+    .underflow_count  ()
   );
   
   // AT25010 EEPROM Interface
@@ -218,7 +306,7 @@ module main_core #(
     .MAX_BYTES_PER_CS  (3),
     .CS_INACTIVE_CLKS  (10)
   ) u_eeprom (
-    .clk              (clk),
+    .clk              (eeprom_clk),
     .rst_n            (rst_n),
     .cmd_valid        (eeprom_cmd_valid),
     .cmd_ready        (eeprom_cmd_ready),
@@ -240,7 +328,7 @@ module main_core #(
     .MAX_BYTES_PER_CS  (2),
     .CS_INACTIVE_CLKS  (10)
   ) u_nfc (
-    .clk              (clk),
+    .clk              (nfc_clk),
     .rst_n            (rst_n),
     .cmd_valid        (nfc_cmd_valid),
     .cmd_ready        (nfc_cmd_ready),
@@ -255,6 +343,35 @@ module main_core #(
     .spi_miso         (nfc_spi_miso)
   );
   
+  // ============================================
+  // SPI Clock Gating
+  // ============================================
+  
+  // Each interface is clocked only while a command is pending, in flight
+  // (cmd_ready low, CS asserted) or completing. Both interfaces drop back
+  // to cmd_ready=1 only after the SPI master has left CS_INACTIVE.
+  assign eeprom_clk_en = eeprom_cmd_valid || !eeprom_cmd_ready || eeprom_cmd_done || !eeprom_spi_cs_n;
+  assign nfc_clk_en    = nfc_cmd_valid || !nfc_cmd_ready || nfc_cmd_done || !nfc_spi_cs_n;
+  
+  generate
+    if (LOW_POWER) begin : g_spi_clock_gating
+      clock_gate u_eeprom_cg (
+        .clk  (clk),
+        .en   (eeprom_clk_en),
+        .gclk (eeprom_clk)
+      );
+      
+      clock_gate u_nfc_cg (
+        .clk  (clk),
+        .en   (nfc_clk_en),
+        .gclk (nfc_clk)
+      );
+    end else begin : g_spi_free_clock
+      assign eeprom_clk = clk;
+      assign nfc_clk    = clk;
+    end
+  endgenerate
+  
   // ============================================
   // Key Storage Interface Logic
   // ============================================
@@ -316,6 +433,35 @@ module main_core #(
   // Note: Authentication start is now controlled by nfc_card_detector
   // The detector triggers auth_start after successful card detection
   
+  // ============================================
+  // Slow Tick Prescaler
+  // ============================================
+  
+  assign timers_active = (timeout_counter != 0) || (unlock_timer != 0);
+  
+  generate
+    if (TICK_DIV > 1) begin : g_slow_tick
+      logic [$clog2(TICK_DIV)-1:0] tick_prescaler;
+      
+      // Runs only while a wait-state timer is loaded
+      always_ff @(posedge clk or negedge rst_n) begin
+        if (!rst_n) begin
+          tick_prescaler <= '0;
+        end else if (!timers_active || timeout_start || (auth_success && card_id_valid)) begin
+          tick_prescaler <= '0;
+        end else if (tick_prescaler == TICK_DIV - 1) begin
+          tick_prescaler <= '0;
+        end else begin
+          tick_prescaler <= tick_prescaler + 1;
+        end
+      end
+      
+      assign slow_tick = timers_active && (tick_prescaler == TICK_DIV - 1);
+    end else begin : g_fast_tick
+      assign slow_tick = 1'b1;
+    end
+  endgenerate
+  
   // ============================================
   // Timeout Watchdog
   // ============================================
@@ -326,12 +472,18 @@ module main_core #(
       timeout_occurred <= 1'b0;
     end else begin
       if (timeout_start) begin
-        timeout_counter <= TIMEOUT_CYCLES;
+        timeout_counter <= TIMEOUT_TICKS;
+        timeout_occurred <= 1'b0;
+      end else if (LOW_POWER && !auth_busy) begin
+        // Nothing to guard once authentication has finished
+        timeout_counter <= 32'h0;
         timeout_occurred <= 1'b0;
       end else if (timeout_counter > 0) begin
-        timeout_counter <= timeout_counter - 1;
-        if (timeout_counter == 1) begin
-          timeout_occurred <= 1'b1;
+        if (slow_tick) begin
+          timeout_counter <= timeout_counter - 1;
+          if (timeout_counter == 1) begin
+            timeout_occurred <= 1'b1;
+          end
         end
       end else begin
         timeout_occurred <= 1'b0;
@@ -352,8 +504,8 @@ module main_core #(
         // TODO: Check card_id against authorized list in EEPROM
         // For now, unlock on any successful authentication
         door_unlock_reg <= 1'b1;
-        unlock_timer <= UNLOCK_DURATION;
-      end else if (unlock_timer > 0) begin
+        unlock_timer <= UNLOCK_TICKS;
+      end else if (unlock_timer > 0 && slow_tick) begin
         unlock_timer <= unlock_timer - 1;
         if (unlock_timer == 1) begin
           door_unlock_reg <= 1'b0;
@@ -369,7 +521,7 @@ module main_core #(
   // ============================================
   
   assign status_unlock = door_unlock_reg;
-  assign status_fault  = auth_failed;
+  assign status_fault  = auth_failed || cache_reject;
   assign status_busy   = auth_busy;
 
 endmodule
@@ -1,8 +1,14 @@
 // NFC Card Detector Module
 // Implements ISO14443A card detection and selection
 // Detects card presence and reads UID before triggering authentication
+// SESSION_MODE: after a successful authentication the card is halted and
+// kept as the current session until it leaves the field
 
-module nfc_card_detector (
+module nfc_card_detector #(
+  parameter SESSION_MODE            = 0,             // 1 = halt and track authenticated card
+  parameter PRESENCE_CHECK_CYCLES   = 32'd10000000,  // Presence check interval (100 ms at 100MHz)
+  parameter PRESENCE_TIMEOUT_CYCLES = 32'd50000      // No answer to a presence frame (500 us)
+)(
   input  logic         clk,
   input  logic         rst_n,
   
@@ -17,6 +23,11 @@ module nfc_card_detector (
   // To auth_controller
   output logic         start_auth,        // Trigger authentication
   
+  // From auth_controller (used in SESSION_MODE)
+  input  logic         auth_success,      // Authentication of the selected card passed
+  input  logic         auth_failed,       // Authentication of the selected card failed
+  output logic         session_active,    // Authenticated card halted and still present
+  
   // NFC Interface (MFRC522)
   output logic         nfc_cmd_valid,
   input  logic         nfc_cmd_ready,
@@ -49,6 +60,7 @@ module nfc_card_detector (
   localparam [7:0] CMD_WUPA     = 8'h52;  // Wake-Up Type A
   localparam [7:0] CMD_ANTICOLL = 8'h93;  // Anti-collision CL1
   localparam [7:0] CMD_SELECT   = 8'h93;  // Select CL1
+  localparam [7:0] CMD_HALT     = 8'h50;  // HLTA (Halt Type A)
   
   // Expected responses
   localparam [15:0] ATQA_MIFARE = 16'h0004;  // Typical ATQA response
@@ -64,6 +76,7 @@ module nfc_card_detector (
     ST_CONFIG_CRC,      // New: Configure Tx CRC
     ST_CONFIG_RX_CRC,   // New: Configure Rx CRC
     ST_TX_FIFO,
+    ST_TX_CLEAR_IRQ,    // RxIRq must come from this frame
     ST_TX_CMD,
     ST_TX_FRAMING,
     ST_POLL_IRQ,
@@ -76,14 +89,21 @@ module nfc_card_detector (
     ST_CHECK_SAK,
     
     ST_CARD_READY,
-    ST_ERROR
+    ST_ERROR,
+    
+    // Session Mode States
+    ST_AUTH_WAIT,       // Wait for the authentication result
+    ST_SESSION,         // Card halted, waiting for next presence check
+    ST_PRESENCE_MISS    // No answer to a presence frame
   } state_t;
   
   typedef enum logic [2:0] {
     PROT_IDLE,
     PROT_REQA,
     PROT_ANTICOLL,
-    PROT_SELECT
+    PROT_SELECT,
+    PROT_WUPA,
+    PROT_HALT
   } protocol_t;
   
   state_t state, next_state;
@@ -97,6 +117,11 @@ module nfc_card_detector (
   logic        command_sent;
   logic        irq_detected;
   
+  // Session tracking
+  logic        presence_check;    // Current frame is a presence check
+  logic [31:0] presence_timer;
+  logic [31:0] poll_cycles;
+  
   // Transaction buffers
   logic [7:0]  tx_buffer [0:15];
   logic [3:0]  tx_length;
@@ -161,16 +186,26 @@ module nfc_card_detector (
             if (tx_index < tx_length - 1)
                 next_state = ST_TX_FIFO; // Send next byte
             else
-                next_state = ST_TX_CMD;
+                next_state = ST_TX_CLEAR_IRQ;
         end
       end
       
+      ST_TX_CLEAR_IRQ: begin
+        if (nfc_cmd_done) next_state = ST_TX_CMD;
+      end
+      
       ST_TX_CMD: begin
         if (nfc_cmd_done) next_state = ST_TX_FRAMING;
       end
       
       ST_TX_FRAMING: begin
-        if (nfc_cmd_done) next_state = ST_POLL_IRQ;
+        if (nfc_cmd_done) begin
+            // HLTA is never answered
+            if (protocol_state == PROT_HALT)
+                next_state = ST_SESSION;
+            else
+                next_state = ST_POLL_IRQ;
+        end
       end
       
       ST_POLL_IRQ: begin
@@ -178,13 +213,20 @@ module nfc_card_detector (
             // Check RxIRq bit (0x20)
             if (nfc_cmd_rdata[5]) 
                 next_state = ST_READ_FIFO_LEVEL;
+            else if (presence_check && (nfc_cmd_rdata[0] || poll_cycles >= PRESENCE_TIMEOUT_CYCLES))
+                next_state = ST_PRESENCE_MISS; // TimerIRq or no answer in time
             else
                 next_state = ST_POLL_IRQ; // Keep polling
         end
       end
       
       ST_READ_FIFO_LEVEL: begin
-        if (nfc_cmd_done) next_state = ST_READ_FIFO_DATA;
+        if (nfc_cmd_done) begin
+            if (presence_check && nfc_cmd_rdata[3:0] == 4'h0)
+                next_state = ST_PRESENCE_MISS; // Nothing received
+            else
+                next_state = ST_READ_FIFO_DATA;
+        end
       end
       
       ST_READ_FIFO_DATA: begin
@@ -195,6 +237,7 @@ module nfc_card_detector (
                 // Transaction complete, decide next based on protocol
                 case (protocol_state)
                     PROT_REQA:     next_state = ST_CHECK_ATQA;
+                    PROT_WUPA:     next_state = ST_CHECK_ATQA;
                     PROT_ANTICOLL: next_state = ST_CHECK_UID;
                     PROT_SELECT:   next_state = ST_CHECK_SAK;
                     default:       next_state = ST_IDLE;
@@ -206,8 +249,11 @@ module nfc_card_detector (
       // --- Protocol Logic ---
       ST_CHECK_ATQA: begin
         if (atqa_response == ATQA_MIFARE) begin
+          // After WUPA any halted card may have answered, ST_CHECK_UID tells
           next_state = ST_TX_FIFO;
           next_protocol_state = PROT_ANTICOLL;
+        end else if (presence_check) begin
+          next_state = ST_PRESENCE_MISS;
         end else if (retry_count < 3) begin
           next_state = ST_TX_FIFO; // Retry REQA
           next_protocol_state = PROT_REQA;
@@ -216,8 +262,14 @@ module nfc_card_detector (
       end
       
       ST_CHECK_UID: begin
-        next_state = ST_TX_FIFO;
-        next_protocol_state = PROT_SELECT;
+        if (presence_check && uid_buffer == card_uid) begin
+          // Session card still present: halt it again
+          next_state = ST_FLUSH_FIFO;
+          next_protocol_state = PROT_HALT;
+        end else begin
+          next_state = ST_TX_FIFO;
+          next_protocol_state = PROT_SELECT;
+        end
       end
       
       ST_CHECK_SAK: begin
@@ -228,14 +280,50 @@ module nfc_card_detector (
       end
       
       ST_CARD_READY: begin
-        next_state = ST_IDLE;
-        next_protocol_state = PROT_IDLE;
+        if (SESSION_MODE) begin
+          next_state = ST_AUTH_WAIT;
+        end else begin
+          next_state = ST_IDLE;
+          next_protocol_state = PROT_IDLE;
+        end
       end
       
       ST_ERROR: begin
         next_state = ST_IDLE;
         next_protocol_state = PROT_IDLE;
       end
+      
+      // --- Session Mode ---
+      ST_AUTH_WAIT: begin
+        if (auth_failed) begin
+          next_state = ST_IDLE;
+          next_protocol_state = PROT_IDLE;
+        end else if (auth_success) begin
+          next_state = ST_FLUSH_FIFO;
+          next_protocol_state = PROT_HALT;
+        end
+      end
+      
+      ST_SESSION: begin
+        // REQA is only answered by a card that is not halted, i.e. a new one
+        if (irq_detected || presence_timer >= PRESENCE_CHECK_CYCLES) begin
+          next_state = ST_CLEAR_IRQ;
+          next_protocol_state = PROT_REQA;
+        end
+      end
+      
+      ST_PRESENCE_MISS: begin
+        if (protocol_state == PROT_REQA) begin
+          // No new card: wake the halted one. Clear the REQA's TimerIRq
+          // first, or the WUPA's first poll sees it and drops the session
+          next_state = ST_CLEAR_IRQ;
+          next_protocol_state = PROT_WUPA;
+        end else begin
+          // Session card left the field
+          next_state = ST_IDLE;
+          next_protocol_state = PROT_IDLE;
+        end
+      end
     endcase
   end
   
@@ -264,9 +352,14 @@ module nfc_card_detector (
       card_uid <= 32'h0;
       card_ready <= 1'b0;
       start_auth <= 1'b0;
+      session_active <= 1'b0;
       detection_error <= 1'b0;
       error_code <= 8'h00;
       
+      presence_check <= 1'b0;
+      presence_timer <= 32'h0;
+      poll_cycles <= 32'h0;
+      
       uid_buffer <= 32'h0;
       atqa_response <= 16'h0;
       sak_response <= 8'h0;
@@ -294,6 +387,8 @@ module nfc_card_detector (
         // Reset indices when entering new state
         if (next_state == ST_TX_FIFO) tx_index <= 0;
         if (next_state == ST_READ_FIFO_DATA) rx_index <= 0;
+        if (next_state == ST_POLL_IRQ) poll_cycles <= 32'h0;
+        if (next_state == ST_SESSION) presence_timer <= 32'h0;
       end
       
       case (state)
@@ -305,6 +400,8 @@ module nfc_card_detector (
           card_ready <= 1'b0;
           detection_error <= 1'b0;
           retry_count <= 4'h0;
+          session_active <= 1'b0;
+          presence_check <= 1'b0;
         end
         
         // --- Generic Transaction Execution ---
@@ -337,8 +434,8 @@ module nfc_card_detector (
                 nfc_cmd_valid <= 1'b1;
                 nfc_cmd_write <= 1'b1;
                 nfc_cmd_addr <= REG_TXMODE;
-                // For SELECT, we need CRC. For others (REQA, ANTICOLL), we don't.
-                if (protocol_state == PROT_SELECT)
+                // For SELECT and HLTA, we need CRC. For others (REQA, WUPA, ANTICOLL), we don't.
+                if (protocol_state == PROT_SELECT || protocol_state == PROT_HALT)
                     nfc_cmd_wdata <= 8'h80; // TxCRCEn
                 else
                     nfc_cmd_wdata <= 8'h00; // Disable CRC
@@ -383,6 +480,16 @@ module nfc_card_detector (
                         framing_bits <= 8'h80;
                         $display("[%0t] [NFC_DETECTOR] → SELECT", $time);
                     end
+                    PROT_WUPA: begin
+                        tx_length <= 1;
+                        framing_bits <= 8'h87; // 7 bits
+                        $display("[%0t] [NFC_DETECTOR] → WUPA", $time);
+                    end
+                    PROT_HALT: begin
+                        tx_length <= 2; // + 2 CRC bytes appended by the reader
+                        framing_bits <= 8'h80;
+                        $display("[%0t] [NFC_DETECTOR] → HLTA", $time);
+                    end
                 endcase
             end
 
@@ -394,6 +501,8 @@ module nfc_card_detector (
                 // Direct Data Mux (Avoids buffer latency)
                 case (protocol_state)
                     PROT_REQA: nfc_cmd_wdata <= CMD_REQA;
+                    PROT_WUPA: nfc_cmd_wdata <= CMD_WUPA;
+                    PROT_HALT: nfc_cmd_wdata <= (tx_index == 0) ? CMD_HALT : 8'h00;
                     PROT_ANTICOLL: nfc_cmd_wdata <= (tx_index == 0) ? CMD_ANTICOLL : 8'h20;
                     PROT_SELECT: begin
                         case (tx_index)
@@ -417,6 +526,18 @@ module nfc_card_detector (
             end
         end
         
+        ST_TX_CLEAR_IRQ: begin
+            if (!command_sent && nfc_cmd_ready) begin
+                nfc_cmd_valid <= 1'b1;
+                nfc_cmd_write <= 1'b1;
+                nfc_cmd_addr <= REG_COMIRQ;
+                nfc_cmd_wdata <= 8'h7F; // Stale RxIRq of the previous frame
+                command_sent <= 1'b1;
+            end else if (nfc_cmd_done) begin
+                command_sent <= 1'b0;
+            end
+        end
+        
         ST_TX_CMD: begin
             if (!command_sent && nfc_cmd_ready) begin
                 nfc_cmd_valid <= 1'b1;
@@ -442,6 +563,7 @@ module nfc_card_detector (
         end
         
         ST_POLL_IRQ: begin
+            poll_cycles <= poll_cycles + 1;
             if (!command_sent && nfc_cmd_ready) begin
                 nfc_cmd_valid <= 1'b1;
                 nfc_cmd_write <= 1'b0; // Read
@@ -476,7 +598,7 @@ module nfc_card_detector (
                 if (rx_index < rx_count - 1) rx_index <= rx_index + 1;
                 
                 // Store data based on protocol
-                if (protocol_state == PROT_REQA) begin
+                if (protocol_state == PROT_REQA || protocol_state == PROT_WUPA) begin
                     if (rx_index == 0) atqa_response[7:0] <= nfc_cmd_rdata;
                     if (rx_index == 1) atqa_response[15:8] <= nfc_cmd_rdata;
                 end else if (protocol_state == PROT_ANTICOLL) begin
@@ -489,10 +611,21 @@ module nfc_card_detector (
         
         // --- Protocol Checks ---
         ST_CHECK_ATQA: begin
-          if (atqa_response == ATQA_MIFARE) begin
+          if (atqa_response == ATQA_MIFARE && protocol_state == PROT_WUPA) begin
+            $display("[%0t] [NFC_DETECTOR] ← ATQA: %h (woken, checking UID)", $time, atqa_response);
+          end else if (atqa_response == ATQA_MIFARE) begin
             $display("[%0t] [NFC_DETECTOR] ← ATQA: %h (valid)", $time, atqa_response);
+            if (presence_check) begin
+              // New card answered REQA: end the session, detect it directly
+              $display("[%0t] [NFC_DETECTOR] New card in field, session ended", $time);
+              session_active <= 1'b0;
+              presence_check <= 1'b0;
+              card_ready <= 1'b0;
+            end
             card_detected <= 1'b1;
             retry_count <= 4'h0;
+          end else if (presence_check) begin
+            $display("[%0t] [NFC_DETECTOR] ← ATQA: %h (invalid)", $time, atqa_response);
           end else begin
             $display("[%0t] [NFC_DETECTOR] ← ATQA: %h (invalid, retry)", $time, atqa_response);
             retry_count <= retry_count + 1;
@@ -501,6 +634,16 @@ module nfc_card_detector (
         
         ST_CHECK_UID: begin
           $display("[%0t] [NFC_DETECTOR] ← UID: %h", $time, uid_buffer);
+          if (presence_check && uid_buffer == card_uid) begin
+            $display("[%0t] [NFC_DETECTOR] Session card still present", $time);
+          end else if (presence_check) begin
+            // Another halted card answered the WUPA: end the session, detect it
+            $display("[%0t] [NFC_DETECTOR] Different card woke up, session ended", $time);
+            session_active <= 1'b0;
+            presence_check <= 1'b0;
+            card_ready <= 1'b0;
+            card_detected <= 1'b1;
+          end
         end
         
         ST_CHECK_SAK: begin
@@ -530,6 +673,31 @@ module nfc_card_detector (
             $display("[%0t] [NFC_DETECTOR] ✗ Detection error", $time);
           end
         end
+        
+        // --- Session Mode ---
+        ST_AUTH_WAIT: begin
+          if (auth_success) begin
+            // Hand the NFC bus back to the detector to halt the card
+            card_ready <= 1'b0;
+            $display("[%0t] [NFC_DETECTOR] Authenticated → HLTA, session %h", $time, card_uid);
+          end
+        end
+        
+        ST_SESSION: begin
+          session_active <= 1'b1;
+          presence_check <= 1'b0;
+          presence_timer <= presence_timer + 1;
+          if (next_state == ST_CLEAR_IRQ) begin
+            presence_check <= 1'b1;
+          end
+        end
+        
+        ST_PRESENCE_MISS: begin
+          if (protocol_state != PROT_REQA) begin
+            $display("[%0t] [NFC_DETECTOR] Session card %h left the field", $time, card_uid);
+            session_active <= 1'b0;
+          end
+        end
       endcase
     end
   end
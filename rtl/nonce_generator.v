@@ -1,15 +1,55 @@
-module nonce_generator (
+// Nonce Generator Module
+// A prefetch queue of DEPTH nonces is kept full in the background. Each
+// entry accumulates MIX_CYCLES steps of LFSR output and free-running counter
+// samples; while the queue is full the stored entries keep being re-mixed,
+// so a nonce also depends on when it is taken. A request is served in the
+// same cycle (valid = req) from the queue head, XORed with the free-running
+// counter at request time: queue contents after reset are deterministic, the
+// request time is not. On an empty queue the
+// nonce follows one cycle later and underflow_count is incremented.
+// With LOW_POWER the LFSR and mixer stop once the queue is full and the
+// stored entries are not re-mixed; only the free-running counter keeps
+// toggling while idle and is folded into every nonce served.
+
+module nonce_generator #(
+  parameter DEPTH      = 4,   // Prefetched nonces
+  parameter MIX_CYCLES = 8,   // Mixing steps before a new entry is ready
+  parameter LOW_POWER  = 0    // 1 = hold LFSR and mixer while the queue is full
+)(
   input  logic clk,
   input  logic rst_n,
   input  logic req,
   output logic valid,
-  output logic [63:0] nonce
+  output logic [63:0] nonce,
+  output logic [15:0] underflow_count
 );
 
+  localparam IDX_W = (DEPTH > 1) ? $clog2(DEPTH) : 1;
+  localparam CNT_W = $clog2(DEPTH + 1);
+  localparam MIX_W = (MIX_CYCLES > 1) ? $clog2(MIX_CYCLES) : 1;
+
   logic [63:0] lfsr;
   logic [31:0] free_counter;
+  logic [63:0] mix;
+  logic [MIX_W-1:0] mix_count;
+  logic        mix_ready;
+
+  logic [63:0] entries [DEPTH];
+  logic [IDX_W-1:0] head;
+  logic [IDX_W-1:0] tail;
+  logic [IDX_W-1:0] refresh_ptr;
+  logic [CNT_W-1:0] count;
+
+  logic        pop;
+  logic        push;
+  logic        underflow;
+  logic        late_valid;
+  logic [63:0] late_nonce;
+  logic        hold;
+  logic [63:0] stamp;
 
-  // Free running counter adds jitter-based entropy  
+  // Free running counter adds jitter-based entropy. It keeps running in
+  // LOW_POWER: it is what makes a nonce depend on the request time.
   always_ff @(posedge clk or negedge rst_n) begin
     if (!rst_n)
       free_counter <= 32'h12345678;
@@ -17,25 +57,97 @@ module nonce_generator (
       free_counter <= free_counter + 1;
   end
 
+  // LOW_POWER: nothing to prepare while the queue is full and idle
+  assign hold = LOW_POWER && (count == CNT_W'(DEPTH)) && !req;
+
   // LFSR as above
   function automatic [63:0] lfsr_step(input [63:0] x);
     lfsr_step = { x[62:0], x[0] ^ x[1] ^ x[3] ^ x[4] };
   endfunction
 
+  function automatic [IDX_W-1:0] next_idx(input [IDX_W-1:0] i);
+    next_idx = (i == IDX_W'(DEPTH - 1)) ? '0 : i + 1'b1;
+  endfunction
+
+  // ============================================
+  // Background mixing
+  // ============================================
+
+  always_ff @(posedge clk or negedge rst_n) begin
+    if (!rst_n) begin
+      lfsr      <= 64'hCAFEBEEF12345678;
+      mix       <= 64'h0;
+      mix_count <= '0;
+    end else if (!hold) begin
+      lfsr <= lfsr_step(lfsr);
+      mix  <= {mix[0], mix[63:1]} ^ lfsr ^ {free_counter, free_counter[15:0], free_counter[31:16]};
+
+      if (push || underflow) begin
+        mix_count <= '0;
+      end else if (!mix_ready) begin
+        mix_count <= mix_count + 1'b1;
+      end
+    end
+  end
+
+  assign mix_ready = (mix_count == MIX_W'(MIX_CYCLES - 1));
+
+  // ============================================
+  // Prefetch queue
+  // ============================================
+
+  assign pop       = req && (count != 0);
+  assign underflow = req && (count == 0);
+  assign push      = mix_ready && ((count != CNT_W'(DEPTH)) || pop);
+
   always_ff @(posedge clk or negedge rst_n) begin
     if (!rst_n) begin
-      lfsr   <= 64'hCAFEBEEF12345678;
-      valid  <= 1'b0;
+      for (int i = 0; i < DEPTH; i++) entries[i] <= 64'h0;
+      head        <= '0;
+      tail        <= '0;
+      refresh_ptr <= '0;
+      count       <= '0;
     end else begin
-      valid <= 1'b0;
+      if (pop) head <= next_idx(head);
+
+      if (push) begin
+        entries[tail] <= mix;
+        tail <= next_idx(tail);
+      end else if (!LOW_POWER && count == CNT_W'(DEPTH) && !req) begin
+        // Queue full: keep folding fresh samples into the stored entries
+        entries[refresh_ptr] <= entries[refresh_ptr] ^ mix;
+        refresh_ptr <= next_idx(refresh_ptr);
+      end
+
+      if (push && !pop)
+        count <= count + 1'b1;
+      else if (pop && !push)
+        count <= count - 1'b1;
+    end
+  end
 
-      if (req) begin
-        lfsr  <= lfsr_step(lfsr);
-        valid <= 1'b1;
+  // ============================================
+  // Underflow fallback
+  // ============================================
+
+  always_ff @(posedge clk or negedge rst_n) begin
+    if (!rst_n) begin
+      late_valid      <= 1'b0;
+      late_nonce      <= 64'h0;
+      underflow_count <= 16'h0;
+    end else begin
+      late_valid <= underflow;
+      if (underflow) begin
+        late_nonce <= mix ^ lfsr;
+        if (underflow_count != 16'hFFFF) underflow_count <= underflow_count + 1'b1;
       end
     end
   end
 
-  assign nonce = lfsr ^ {32'h0, free_counter};
+  // Request-time entropy on the served value
+  assign stamp = {free_counter[15:0], free_counter[31:16], free_counter};
+
+  assign valid = pop || late_valid;
+  assign nonce = pop ? entries[head] ^ stamp : late_nonce;
 
 endmodule
@@ -0,0 +1,161 @@
+// Reject Cache Module
+// Small fully associative cache of card UIDs that recently failed
+// authentication. A UID stays blocked for HOLDOFF_CYCLES after its failure;
+// when the cache is full the least recently used entry is replaced.
+
+module reject_cache #(
+  parameter DEPTH          = 4,             // Number of cached UIDs
+  parameter HOLDOFF_CYCLES = 32'd200000000, // Block time after a failure (2 s at 100MHz)
+  parameter TICK_DIV       = 1024           // Hold-off timer resolution in cycles
+)(
+  input  logic         clk,
+  input  logic         rst_n,
+
+  // Lookup (combinational hit)
+  input  logic [31:0]  lookup_uid,
+  input  logic         lookup_valid,
+  output logic         hit,
+
+  // Insert a denied UID
+  input  logic [31:0]  insert_uid,
+  input  logic         insert_valid,
+
+  // Monitoring (saturating)
+  output logic [15:0]  hit_count,
+  output logic [15:0]  insert_count
+);
+
+  localparam HOLDOFF_TICKS = (HOLDOFF_CYCLES + TICK_DIV - 1) / TICK_DIV;
+  localparam TIMER_W       = $clog2(HOLDOFF_TICKS + 1);
+  localparam AGE_W         = (DEPTH > 1) ? $clog2(DEPTH) : 1;
+  localparam IDX_W         = (DEPTH > 1) ? $clog2(DEPTH) : 1;
+
+  logic [31:0]        entry_uid   [DEPTH];
+  logic [TIMER_W-1:0] entry_timer [DEPTH]; // Remaining ticks, 0 = free
+  logic [AGE_W-1:0]   entry_age   [DEPTH]; // 0 = most recently used
+
+  logic [DEPTH-1:0]   match;
+  logic [DEPTH-1:0]   lookup_match;
+  logic               any_active;
+
+  // ============================================
+  // Hold-off tick (runs only while an entry is held)
+  // ============================================
+
+  logic               tick;
+
+  generate
+    if (TICK_DIV > 1) begin : g_tick_div
+      logic [$clog2(TICK_DIV)-1:0] tick_prescaler;
+
+      always_ff @(posedge clk or negedge rst_n) begin
+        if (!rst_n) begin
+          tick_prescaler <= '0;
+        end else if (!any_active || tick_prescaler == TICK_DIV - 1) begin
+          tick_prescaler <= '0;
+        end else begin
+          tick_prescaler <= tick_prescaler + 1;
+        end
+      end
+
+      assign tick = any_active && (tick_prescaler == TICK_DIV - 1);
+    end else begin : g_tick_every_cycle
+      assign tick = 1'b1;
+    end
+  endgenerate
+
+  // ============================================
+  // Lookup
+  // ============================================
+
+  always_comb begin
+    any_active = 1'b0;
+    for (int i = 0; i < DEPTH; i++) begin
+      match[i]        = (entry_timer[i] != 0) && (entry_uid[i] == insert_uid);
+      lookup_match[i] = (entry_timer[i] != 0) && (entry_uid[i] == lookup_uid);
+      if (entry_timer[i] != 0) any_active = 1'b1;
+    end
+  end
+
+  assign hit = lookup_valid && (lookup_match != 0);
+
+  // ============================================
+  // Replacement: existing entry, else free entry, else LRU entry
+  // ============================================
+
+  logic [IDX_W-1:0]   insert_idx;
+  logic [IDX_W-1:0]   hit_idx;
+
+  always_comb begin
+    insert_idx = '0;
+    for (int i = DEPTH - 1; i >= 0; i--) begin
+      if (entry_age[i] == AGE_W'(DEPTH - 1)) insert_idx = IDX_W'(i);
+    end
+    for (int i = DEPTH - 1; i >= 0; i--) begin
+      if (entry_timer[i] == 0) insert_idx = IDX_W'(i);
+    end
+    for (int i = DEPTH - 1; i >= 0; i--) begin
+      if (match[i]) insert_idx = IDX_W'(i);
+    end
+
+    hit_idx = '0;
+    for (int i = DEPTH - 1; i >= 0; i--) begin
+      if (lookup_match[i]) hit_idx = IDX_W'(i);
+    end
+  end
+
+  // ============================================
+  // Entry update
+  // ============================================
+
+  logic               touch;
+  logic [IDX_W-1:0]   touch_idx;
+
+  assign touch     = insert_valid || hit;
+  assign touch_idx = insert_valid ? insert_idx : hit_idx;
+
+  always_ff @(posedge clk or negedge rst_n) begin
+    if (!rst_n) begin
+      for (int i = 0; i < DEPTH; i++) begin
+        entry_uid[i]   <= 32'h0;
+        entry_timer[i] <= '0;
+        entry_age[i]   <= AGE_W'(i);
+      end
+    end else begin
+      for (int i = 0; i < DEPTH; i++) begin
+        if (tick && entry_timer[i] != 0) begin
+          entry_timer[i] <= entry_timer[i] - 1;
+        end
+        // Move the touched entry to the front, age the ones ahead of it
+        if (touch) begin
+          if (IDX_W'(i) == touch_idx) begin
+            entry_age[i] <= '0;
+          end else if (entry_age[i] < entry_age[touch_idx]) begin
+            entry_age[i] <= entry_age[i] + 1;
+          end
+        end
+      end
+
+      // A new failure restarts the hold-off; hits do not extend it
+      if (insert_valid) begin
+        entry_uid[insert_idx]   <= insert_uid;
+        entry_timer[insert_idx] <= TIMER_W'(HOLDOFF_TICKS);
+      end
+    end
+  end
+
+  // ============================================
+  // Monitoring counters
+  // ============================================
+
+  always_ff @(posedge clk or negedge rst_n) begin
+    if (!rst_n) begin
+      hit_count    <= 16'h0;
+      insert_count <= 16'h0;
+    end else begin
+      if (hit && hit_count != 16'hFFFF) hit_count <= hit_count + 1;
+      if (insert_valid && insert_count != 16'hFFFF) insert_count <= insert_count + 1;
+    end
+  end
+
+endmodule
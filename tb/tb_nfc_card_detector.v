@@ -44,6 +44,9 @@ module tb_nfc_card_detector;
     .card_uid         (card_uid),
     .card_ready       (card_ready),
     .start_auth       (start_auth),
+    .auth_success     (1'b0),
+    .auth_failed      (1'b0),
+    .session_active   (),
     .nfc_cmd_valid    (nfc_cmd_valid),
     .nfc_cmd_ready    (nfc_cmd_ready),
     .nfc_cmd_write    (nfc_cmd_write),
@@ -7,6 +7,7 @@ module tb_nonce_generator;
   logic        req;
   logic        valid;
   logic [63:0] nonce;
+  logic [15:0] underflow_count;
 
   // DUT
   nonce_generator dut (
@@ -14,7 +15,8 @@ module tb_nonce_generator;
     .rst_n (rst_n),
     .req   (req),
     .valid (valid),
-    .nonce (nonce)
+    .nonce (nonce),
+    .underflow_count (underflow_count)
   );
 
   // 100 MHz clock
@@ -24,11 +26,19 @@ module tb_nonce_generator;
   task automatic request_nonce(input int idx);
     begin
       req = 1'b1;
-      @(posedge clk);
-      req = 1'b0;
+      #1;
+      if (valid) begin
+        // Served from the prefetch queue in the request cycle
+        $display("[%0t] NONCE %0d: %016h", $time, idx, nonce);
+        @(posedge clk);
+        req = 1'b0;
+      end else begin
+        @(posedge clk);
+        req = 1'b0;
 
-      wait (valid == 1'b1);
-      $display("[%0t] NONCE %0d: %016h", $time, idx, nonce);
+        wait (valid == 1'b1);
+        $display("[%0t] NONCE %0d: %016h (underflow %0d)", $time, idx, nonce, underflow_count);
+      end
 
       @(posedge clk);
     end